@@ -8,12 +8,27 @@ import datetime # Added for marker file timestamp
 import csv      # Added for CSV writing
 import unicodedata
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 import sys
 import time
 from dotenv import load_dotenv
 import subprocess
 import logging
 import signal
+import ctypes
+import threading
+import select
+from contextlib import contextmanager
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Without watchdog the main loop falls back to polling the lock file
+    Observer = None
+    FileSystemEventHandler = object
 load_dotenv()
 
 def get_env_float(env_name, default):
@@ -36,6 +51,27 @@ FETCH_LIMIT = 100
 MORALIS_API_URL = "https://deep-index.moralis.io/api/v2.2/tokens/trending?chain=solana"
 DEFAULT_MAX_WORKERS = 1  # <<<< SET TO 1 AS PER USER REQUEST >>>>
 DEXSCREENER_CHAIN_ID = "solana"
+HOURLY_REPORT_BUFFER_BYTES = 256 * 1024
+_SYNCHRONIZE = 0x00100000  # Windows process access right used by _pid_alive
+_HYPERLINK_PREFIX = f'=HYPERLINK("https://dexscreener.com/{DEXSCREENER_CHAIN_ID}/'
+_HYPERLINK_SUFFIX = '","Open Chart")'
+_FIELDNAMES_CACHE = {}
+TOKEN_RISK_ANALYSIS_HEADER = [
+    'Address','Name','Price USD','Liquidity(1m)','Volume(1m)','1m Change','Open Chart','Snipe','Ghost Buyer',
+    'Global_Cluster_Percentage','Highest_Risk_Reason_Cluster','DexScreener_Pair_Address',
+    'DexScreener_Liquidity_USD','DexScreener_Token_Price_USD','DexScreener_Token_Name',
+    'LP_Percent_Supply','Cluster_Token_Amount_Est','Pool_Project_Token_Amount_Est',
+    'Dump_Risk_LP_vs_Cluster_Ratio','Price_Impact_Cluster_Sell_Percent',
+    'Overall_Risk_Status','Risk_Warning_Details'
+]
+RESULTS_1M_HEADER = ['Address','Name','Price USD','Liquidity(1m)','Volume(1m)','1m Change','Open Chart','Snipe','Ghost Buyer']
+
+def _csv_header_bytes(fields):
+    """Encode a header row exactly as csv.writer would (none of our field names need quoting)."""
+    return (",".join(fields) + "\r\n").encode('utf-8')
+
+_TOKEN_RISK_ANALYSIS_HEADER_BYTES = _csv_header_bytes(TOKEN_RISK_ANALYSIS_HEADER)
+_RESULTS_1M_HEADER_BYTES = _csv_header_bytes(RESULTS_1M_HEADER)
 
 # Parse window minutes
 raw_wt = os.getenv("WHALE_TRAP_WINDOW_MINUTES", "1,5").split('#')[0].strip()
@@ -50,29 +86,51 @@ for part in raw_wt.split(','):
 if not WINDOW_MINS:
     WINDOW_MINS = [1, 5]
 
-# Load configuration values using the get_env_float helper
-SNIPE_GRADUATED_DELTA_MINUTES_FLOAT = get_env_float("SNIPE_GRADUATED_DELTA_MINUTES", 60.0)
-PRELIM_LIQUIDITY_THRESHOLD = get_env_float("PRELIM_LIQUIDITY_THRESHOLD", 5000.0)
-PRELIM_MIN_PRICE_USD = get_env_float("PRELIM_MIN_PRICE_USD", 0.00001)
-PRELIM_MAX_PRICE_USD = get_env_float("PRELIM_MAX_PRICE_USD", 0.0004)
-PRELIM_AGE_DELTA_MINUTES = get_env_float("PRELIM_AGE_DELTA_MINUTES", 120.0)
-
-# Whale trap configuration
-WHALE_PRICE_UP_PCT = get_env_float("WHALE_PRICE_UP_PCT", 0.0)
-WHALE_LIQUIDITY_UP_PCT = get_env_float("WHALE_LIQUIDITY_UP_PCT", 0.0)
-WHALE_VOLUME_DOWN_PCT = get_env_float("WHALE_VOLUME_DOWN_PCT", 0.0)
-
-# Snipe configuration
-SNIPE_LIQUIDITY_UP_PCT_CONFIG = get_env_float("SNIPE_LIQUIDITY_UP_PCT", 0.30)
-SNIPE_LIQUIDITY_MIN_PCT_1M = get_env_float("SNIPE_LIQUIDITY_MIN_PCT_1M", 0.1)
-SNIPE_LIQUIDITY_MULTIPLIER_1M = get_env_float("SNIPE_LIQUIDITY_MULTIPLIER_1M", 1.5)
-SNIPE_LIQUIDITY_MIN_PCT_5M = get_env_float("SNIPE_LIQUIDITY_MIN_PCT_5M", SNIPE_LIQUIDITY_UP_PCT_CONFIG)
-SNIPE_LIQUIDITY_MULTIPLIER_5M = get_env_float("SNIPE_LIQUIDITY_MULTIPLIER_5M", 5.0)
+@dataclass(frozen=True)
+class Config:
+    """Filter thresholds parsed once from the environment; read-only at runtime."""
+    snipe_graduated_delta_minutes: float
+    prelim_liquidity_threshold: float
+    prelim_min_price_usd: float
+    prelim_max_price_usd: float
+    prelim_age_delta_minutes: float
+    whale_price_up_pct: float
+    whale_liquidity_up_pct: float
+    whale_volume_down_pct: float
+    snipe_liquidity_up_pct: float
+    snipe_liquidity_min_pct_1m: float
+    snipe_liquidity_multiplier_1m: float
+    snipe_liquidity_min_pct_5m: float
+    snipe_liquidity_multiplier_5m: float
+    ghost_volume_min_pct_1m: float
+    ghost_volume_min_pct_5m: float
+    ghost_price_rel_multiplier: float
+
+def load_config():
+    snipe_liquidity_up_pct = get_env_float("SNIPE_LIQUIDITY_UP_PCT", 0.30)
+    return Config(
+        snipe_graduated_delta_minutes=get_env_float("SNIPE_GRADUATED_DELTA_MINUTES", 60.0),
+        prelim_liquidity_threshold=get_env_float("PRELIM_LIQUIDITY_THRESHOLD", 5000.0),
+        prelim_min_price_usd=get_env_float("PRELIM_MIN_PRICE_USD", 0.00001),
+        prelim_max_price_usd=get_env_float("PRELIM_MAX_PRICE_USD", 0.0004),
+        prelim_age_delta_minutes=get_env_float("PRELIM_AGE_DELTA_MINUTES", 120.0),
+        # Whale trap configuration
+        whale_price_up_pct=get_env_float("WHALE_PRICE_UP_PCT", 0.0),
+        whale_liquidity_up_pct=get_env_float("WHALE_LIQUIDITY_UP_PCT", 0.0),
+        whale_volume_down_pct=get_env_float("WHALE_VOLUME_DOWN_PCT", 0.0),
+        # Snipe configuration
+        snipe_liquidity_up_pct=snipe_liquidity_up_pct,
+        snipe_liquidity_min_pct_1m=get_env_float("SNIPE_LIQUIDITY_MIN_PCT_1M", 0.1),
+        snipe_liquidity_multiplier_1m=get_env_float("SNIPE_LIQUIDITY_MULTIPLIER_1M", 1.5),
+        snipe_liquidity_min_pct_5m=get_env_float("SNIPE_LIQUIDITY_MIN_PCT_5M", snipe_liquidity_up_pct),
+        snipe_liquidity_multiplier_5m=get_env_float("SNIPE_LIQUIDITY_MULTIPLIER_5M", 5.0),
+        # Ghost buyer configuration
+        ghost_volume_min_pct_1m=get_env_float("GHOST_VOLUME_MIN_PCT_1M", 0.5),
+        ghost_volume_min_pct_5m=get_env_float("GHOST_VOLUME_MIN_PCT_5M", 0.5),
+        ghost_price_rel_multiplier=get_env_float("GHOST_PRICE_REL_MULTIPLIER", 2.0),
+    )
 
-# Ghost buyer configuration
-GHOST_VOLUME_MIN_PCT_1M = get_env_float("GHOST_VOLUME_MIN_PCT_1M", 0.5)
-GHOST_VOLUME_MIN_PCT_5M = get_env_float("GHOST_VOLUME_MIN_PCT_5M", 0.5)
-GHOST_PRICE_REL_MULTIPLIER = get_env_float("GHOST_PRICE_REL_MULTIPLIER", 2.0)
+CFG = load_config()
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
@@ -107,31 +165,36 @@ def get_trending_tokens():
 
 def filter_preliminary(tokens):
     now = datetime.datetime.now(datetime.timezone.utc)
+    liq_th = CFG.prelim_liquidity_threshold
+    pmin, pmax = CFG.prelim_min_price_usd, CFG.prelim_max_price_usd
+    age_lim = CFG.prelim_age_delta_minutes
+    now_ts = time.time()
     filtered = []
     for token in tokens:
         if not isinstance(token, dict):
             continue
+        # Cheapest checks first; most trending tokens fail on liquidity alone.
         raw_liq_val = token.get("liquidityUsd", 0)
         try:
             liquidity = float(raw_liq_val if raw_liq_val is not None else 0)
         except (ValueError, TypeError):
             liquidity = 0.0
+        if liquidity < liq_th:
+            continue
         try:
             price_usd = float(token.get("usdPrice", 0))
         except (ValueError, TypeError):
             price_usd = 0.0
+        if not pmin <= price_usd <= pmax:
+            continue
         token_created_at = token.get("createdAt")
-        minutes_diff = float("inf")
-        if token_created_at:
-            try:
-                minutes_diff = (time.time() - token_created_at) / 60
-            except Exception:
-                minutes_diff = float("inf")
-        if (
-            liquidity >= PRELIM_LIQUIDITY_THRESHOLD
-            and PRELIM_MIN_PRICE_USD <= price_usd <= PRELIM_MAX_PRICE_USD
-            and minutes_diff <= PRELIM_AGE_DELTA_MINUTES
-        ):
+        if not token_created_at:
+            continue
+        try:
+            minutes_diff = (now_ts - token_created_at) / 60
+        except Exception:
+            continue
+        if minutes_diff <= age_lim:
             filtered.append(token)
     logging.info(f"{len(filtered)} tokens passed preliminary filters.")
     return filtered
@@ -146,15 +209,28 @@ async def fetch_token_data(session, token_address):
     except Exception:
         return None
 
-async def fetch_all_token_data(token_addresses):
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_token_data(session, addr) for addr in token_addresses]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+async def _gather_token_data(session, token_addresses):
+    tasks = [fetch_token_data(session, addr) for addr in token_addresses]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
     data_map = {}
     for addr, res in zip(token_addresses, results):
         data_map[addr] = res if not isinstance(res, Exception) else None
     return data_map
 
+async def fetch_all_token_data(token_addresses):
+    async with aiohttp.ClientSession() as session:
+        return await _gather_token_data(session, token_addresses)
+
+async def capture_two_snapshots(token_addresses, sleep_seconds, win_minutes):
+    """Fetch the t0 and t1 snapshots over one session, awaiting the window in between."""
+    async with aiohttp.ClientSession() as session:
+        first_data = await _gather_token_data(session, token_addresses)
+        logging.info(f"Captured t0 for {len(first_data)} tokens in {win_minutes}m window. Waiting {sleep_seconds}s...")
+        await asyncio.sleep(sleep_seconds)
+        second_data = await _gather_token_data(session, token_addresses)
+        logging.info(f"Captured t1 for {len(second_data)} tokens in {win_minutes}m window.")
+    return first_data, second_data
+
 def get_token_metrics(token_pair_data_list):
     if not token_pair_data_list or not isinstance(token_pair_data_list, list): return 0.0, 0.0, 0.0
     token_data = token_pair_data_list[0] if token_pair_data_list else {}
@@ -176,21 +252,21 @@ def whale_trap_avoidance(token_address, first_snap, second_snap):
     price_change_pct = (price2 - price1) / price1 if price1 else float('inf') if price2 > 0 else 0
     volume_change_pct = (volume2 - volume1) / volume1 if volume1 else float('inf') if volume2 > 0 else 0
     liq_change_pct = (liquidity2 - liquidity1) / liquidity1 if liquidity1 else float('inf') if liquidity2 > 0 else 0
-    if price_change_pct > WHALE_PRICE_UP_PCT and liq_change_pct > WHALE_LIQUIDITY_UP_PCT and volume_change_pct < WHALE_VOLUME_DOWN_PCT:
+    if price_change_pct > CFG.whale_price_up_pct and liq_change_pct > CFG.whale_liquidity_up_pct and volume_change_pct < CFG.whale_volume_down_pct:
         logging.warning(f"[WARN] Whale trap for {token_address}: Price↑, Liquidity↑, Vol Δ {volume_change_pct:.2%}")
         return False
-    if price_change_pct > WHALE_PRICE_UP_PCT and liq_change_pct > WHALE_LIQUIDITY_UP_PCT and volume_change_pct >= WHALE_VOLUME_DOWN_PCT:
+    if price_change_pct > CFG.whale_price_up_pct and liq_change_pct > CFG.whale_liquidity_up_pct and volume_change_pct >= CFG.whale_volume_down_pct:
         return True
     return False
 
 def apply_whale_trap(tokens, first_snaps, second_snaps):
+    # Pure arithmetic per token: evaluate inline rather than paying executor/future overhead.
     passed = []
-    max_workers_for_whale_trap = DEFAULT_MAX_WORKERS if tokens else 1 # Adheres to global DEFAULT_MAX_WORKERS
-    
-    with ThreadPoolExecutor(max_workers=max_workers_for_whale_trap) as executor:
-        futures = {executor.submit(whale_trap_avoidance, t.get('tokenAddress'), first_snaps.get(t.get('tokenAddress'), (0,0,0)), second_snaps.get(t.get('tokenAddress'), (0,0,0))): t for t in tokens if t.get('tokenAddress')}
-        for future in as_completed(futures):
-            if future.result(): passed.append(futures[future])
+    zero_snap = (0, 0, 0)
+    for t in tokens:
+        addr = t.get('tokenAddress')
+        if addr and whale_trap_avoidance(addr, first_snaps.get(addr, zero_snap), second_snaps.get(addr, zero_snap)):
+            passed.append(t)
     logging.info(f"{len(passed)} tokens passed Whale Trap Avoidance.")
     return passed
 
@@ -202,40 +278,64 @@ def sanitize_name(name, fallback_name=None):
     if not sanitized: sanitized = ''.join(ch for ch in name_str if ch.isalnum() or ch in ' _-()[]{}<>')
     return sanitized[:30].strip() or (fallback_name or 'Unknown')
 
+def read_token_addresses(f):
+    """Read the Address column from an open results CSV. Returns (header, addresses)."""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if not header or 'Address' not in header:
+        return header, set()
+    idx = header.index('Address')
+    return header, {row[idx].strip() for row in reader if len(row) > idx and row[idx]}
+
 def load_existing_tokens(csv_filepath):
     """Load existing token addresses from CSV file"""
     existing_tokens = set()
     if os.path.exists(csv_filepath):
         try:
             with open(csv_filepath, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row.get('Address'):
-                        existing_tokens.add(row['Address'].strip())
+                _, existing_tokens = read_token_addresses(f)
         except Exception as e:
             logging.error(f"Error reading existing tokens from {csv_filepath}: {e}")
     return existing_tokens
 
+@contextmanager
+def exclusive_file_lock(f):
+    """Hold an exclusive lock on an open file, flushing pending writes before release."""
+    if os.name == 'nt':
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield f
+    finally:
+        f.flush()
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _fieldnames_for(win_minutes):
+    fieldnames = _FIELDNAMES_CACHE.get(win_minutes)
+    if fieldnames is None:
+        fieldnames = ['Address','Name','Price USD',f'Liquidity({win_minutes}m)',
+                      f'Volume({win_minutes}m)',f'{win_minutes}m Change',
+                      'Open Chart','Snipe','Ghost Buyer']
+        _FIELDNAMES_CACHE[win_minutes] = fieldnames
+    return fieldnames
+
 def process_window(win_minutes, prelim_tokens, script_dir_path):
     sleep_seconds = win_minutes * 60
     abs_csv_filepath = os.path.join(script_dir_path, f"sniperx_results_{win_minutes}m.csv")
-    
-    # Load existing tokens to avoid duplicates
-    existing_tokens = load_existing_tokens(abs_csv_filepath)
-    # Create a backup of the existing tokens to track new additions in this run
-    existing_tokens_at_start = set(existing_tokens)
 
     logging.info(f"=== Running filters for {win_minutes}m window ({sleep_seconds}s) ===")
     token_addresses = [t.get('tokenAddress') for t in prelim_tokens if t.get('tokenAddress')]
     if not token_addresses: return {'whale': [], 'snipe': [], 'ghost': []}
     
-    first_data = asyncio.run(fetch_all_token_data(token_addresses))
+    first_data, second_data = asyncio.run(capture_two_snapshots(token_addresses, sleep_seconds, win_minutes))
     first_snaps = {addr: get_token_metrics(first_data.get(addr)) for addr in token_addresses}
-    logging.info(f"Captured t0 for {len(first_snaps)} tokens in {win_minutes}m window. Waiting {sleep_seconds}s...")
-    time.sleep(sleep_seconds)
-    second_data = asyncio.run(fetch_all_token_data(token_addresses))
     second_snaps = {addr: get_token_metrics(second_data.get(addr)) for addr in token_addresses}
-    logging.info(f"Captured t1 for {len(second_snaps)} tokens in {win_minutes}m window.")
     
     passed_whale_trap = apply_whale_trap(prelim_tokens, first_snaps, second_snaps)
     snipe_candidates, ghost_buyer_candidates = [], []
@@ -244,7 +344,7 @@ def process_window(win_minutes, prelim_tokens, script_dir_path):
         token_created_at = token_info.get("createdAt")
         if token_created_at:
             age_minutes = (time.time() - token_created_at) / 60
-            if age_minutes > SNIPE_GRADUATED_DELTA_MINUTES_FLOAT:
+            if age_minutes > CFG.snipe_graduated_delta_minutes:
                 continue
         addr = token_info.get('tokenAddress')
         p1,l1,v1 = first_snaps.get(addr,(0,0,0)); p2,l2,v2 = second_snaps.get(addr,(0,0,0))
@@ -253,31 +353,34 @@ def process_window(win_minutes, prelim_tokens, script_dir_path):
         prc_chg = (p2-p1)/p1 if p1 else float('inf') if p2 else 0
         if vol_chg > 0.01 and prc_chg > 0.01 and liq_chg >= 0.05 and liq_chg > vol_chg and liq_chg > prc_chg:
             snipe_candidates.append(token_info)
-        ghost_vol_min = GHOST_VOLUME_MIN_PCT_1M if win_minutes == 1 else GHOST_VOLUME_MIN_PCT_5M
-        if vol_chg > ghost_vol_min and abs(prc_chg) < (vol_chg * GHOST_PRICE_REL_MULTIPLIER):
+        ghost_vol_min = CFG.ghost_volume_min_pct_1m if win_minutes == 1 else CFG.ghost_volume_min_pct_5m
+        if vol_chg > ghost_vol_min and abs(prc_chg) < (vol_chg * CFG.ghost_price_rel_multiplier):
             ghost_buyer_candidates.append(token_info)
             
-    final_results_for_csv = snipe_candidates + [t for t in ghost_buyer_candidates if t not in snipe_candidates]
-    
-    # Filter out tokens that were already in the file at the start
-    new_tokens = [t for t in final_results_for_csv 
-                 if t.get('tokenAddress') and t['tokenAddress'] not in existing_tokens_at_start]
+    snipe_addrs = {t.get('tokenAddress') for t in snipe_candidates}
+    ghost_addrs = {t.get('tokenAddress') for t in ghost_buyer_candidates}
+    final_results_for_csv = snipe_candidates + [t for t in ghost_buyer_candidates if t.get('tokenAddress') not in snipe_addrs]
     
-    if not new_tokens:
+    if not final_results_for_csv:
         logging.info(f"No new tokens to add to {abs_csv_filepath}")
         return {'whale': [], 'snipe': [], 'ghost': []}
-    
-    # Write header if file doesn't exist
-    write_header = not os.path.exists(abs_csv_filepath)
-    
+
     try:
-        with open(abs_csv_filepath, 'a' if os.path.exists(abs_csv_filepath) else 'w', 
-                 newline='', encoding='utf-8') as csvfile:
-            
-            fieldnames = ['Address','Name','Price USD',f'Liquidity({win_minutes}m)',
-                        f'Volume({win_minutes}m)',f'{win_minutes}m Change',
-                        'Open Chart','Snipe','Ghost Buyer']
-            
+        # One locked append handle: read existing addresses and write new rows without a
+        # window for another writer to slip in between.
+        with open(abs_csv_filepath, 'a+', newline='', encoding='utf-8') as csvfile, exclusive_file_lock(csvfile):
+            csvfile.seek(0)
+            header, existing_tokens = read_token_addresses(csvfile)
+            write_header = header is None
+
+            new_tokens = [t for t in final_results_for_csv
+                         if t.get('tokenAddress') and t['tokenAddress'] not in existing_tokens]
+            if not new_tokens:
+                logging.info(f"No new tokens to add to {abs_csv_filepath}")
+                return {'whale': [], 'snipe': [], 'ghost': []}
+
+            fieldnames = _fieldnames_for(win_minutes)
+            liq_col, vol_col, chg_col = fieldnames[3], fieldnames[4], fieldnames[5]
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             if write_header:
                 writer.writeheader()
@@ -285,7 +388,7 @@ def process_window(win_minutes, prelim_tokens, script_dir_path):
             rows_added = 0
             for t_data in new_tokens:
                 addr = t_data.get('tokenAddress')
-                if not addr or addr in existing_tokens:
+                if addr in existing_tokens:
                     continue
                     
                 p1, l1, v1 = first_snaps.get(addr, (0, 0, 0))
@@ -295,12 +398,12 @@ def process_window(win_minutes, prelim_tokens, script_dir_path):
                     'Address': addr, 
                     'Name': sanitize_name(t_data.get('name'), t_data.get('symbol')),
                     'Price USD': f"{p2:.8f}", 
-                    f'Liquidity({win_minutes}m)': f"{l2:.2f}",
-                    f'Volume({win_minutes}m)': f"{max(0, v2-v1):.2f}", 
-                    f'{win_minutes}m Change': f"{((p2/p1-1)*100 if p1 else 0):.2f}",
-                    'Open Chart': f'=HYPERLINK(\"https://dexscreener.com/{DEXSCREENER_CHAIN_ID}/{addr}\",\"Open Chart\")',
-                    'Snipe': 'Yes' if t_data in snipe_candidates else '', 
-                    'Ghost Buyer': 'Yes' if t_data in ghost_buyer_candidates else ''
+                    liq_col: f"{l2:.2f}",
+                    vol_col: f"{max(0, v2-v1):.2f}", 
+                    chg_col: f"{((p2/p1-1)*100 if p1 else 0):.2f}",
+                    'Open Chart': _HYPERLINK_PREFIX + addr + _HYPERLINK_SUFFIX,
+                    'Snipe': 'Yes' if addr in snipe_addrs else '', 
+                    'Ghost Buyer': 'Yes' if addr in ghost_addrs else ''
                 })
                 existing_tokens.add(addr)
                 rows_added += 1
@@ -319,29 +422,26 @@ def process_window(win_minutes, prelim_tokens, script_dir_path):
 def initialize_all_files_once(script_dir_path):
     # --- START: First-Run Reset Logic ---
     logging.info("Checking for first run...")
-    first_run_marker_file = os.path.join(script_dir_path, ".sniperx_first_run_complete")
+    first_run_marker_name = ".sniperx_first_run_complete"
+    first_run_marker_file = os.path.join(script_dir_path, first_run_marker_name)
+    # One directory sweep instead of a stat() per file; kept in sync as files are removed/created below.
+    with os.scandir(script_dir_path) as entries:
+        existing = {e.name for e in entries}
 
     results_file_1m_to_reset_name = "sniperx_results_1m.csv"
     opened_tokens_file_to_reset_name = "opened_tokens.txt"
     token_risk_analysis_csv_name = "token_risk_analysis.csv"
     
-    token_risk_analysis_header = [
-        'Address','Name','Price USD','Liquidity(1m)','Volume(1m)','1m Change','Open Chart','Snipe','Ghost Buyer',
-        'Global_Cluster_Percentage','Highest_Risk_Reason_Cluster','DexScreener_Pair_Address',
-        'DexScreener_Liquidity_USD','DexScreener_Token_Price_USD','DexScreener_Token_Name',
-        'LP_Percent_Supply','Cluster_Token_Amount_Est','Pool_Project_Token_Amount_Est',
-        'Dump_Risk_LP_vs_Cluster_Ratio','Price_Impact_Cluster_Sell_Percent',
-        'Overall_Risk_Status','Risk_Warning_Details'
-    ]
-
-    if not os.path.exists(first_run_marker_file):
+
+    if first_run_marker_name not in existing:
         logging.info("First run detected. Resetting specified files.")
         
         # Delete sniperx_results_1m.csv
         results_file_1m_path = os.path.join(script_dir_path, results_file_1m_to_reset_name)
         try:
-            if os.path.exists(results_file_1m_path):
+            if results_file_1m_to_reset_name in existing:
                 os.remove(results_file_1m_path)
+                existing.discard(results_file_1m_to_reset_name)
                 logging.info(f"Deleted {results_file_1m_to_reset_name} as part of first-run reset.")
         except Exception as e:
             logging.error(f"Error deleting {results_file_1m_to_reset_name} during first-run reset: {e}")
@@ -349,8 +449,9 @@ def initialize_all_files_once(script_dir_path):
         # Delete opened_tokens.txt
         opened_tokens_file_path = os.path.join(script_dir_path, opened_tokens_file_to_reset_name)
         try:
-            if os.path.exists(opened_tokens_file_path):
+            if opened_tokens_file_to_reset_name in existing:
                 os.remove(opened_tokens_file_path)
+                existing.discard(opened_tokens_file_to_reset_name)
                 logging.info(f"Deleted {opened_tokens_file_to_reset_name} as part of first-run reset.")
         except Exception as e:
             logging.error(f"Error deleting {opened_tokens_file_to_reset_name} during first-run reset: {e}")
@@ -358,12 +459,12 @@ def initialize_all_files_once(script_dir_path):
         # Reset token_risk_analysis.csv to its header
         token_risk_file_path = os.path.join(script_dir_path, token_risk_analysis_csv_name)
         try:
-            # Delete it first, then recreate with header.
-            if os.path.exists(token_risk_file_path):
-                os.remove(token_risk_file_path)
-            with open(token_risk_file_path, 'w', newline='', encoding='utf-8') as f_csv:
-                writer = csv.writer(f_csv)
-                writer.writerow(token_risk_analysis_header)
+            # Write the header to a temp file and swap it in atomically.
+            token_risk_tmp_path = token_risk_file_path + '.tmp'
+            with open(token_risk_tmp_path, 'wb') as f_csv:
+                f_csv.write(_TOKEN_RISK_ANALYSIS_HEADER_BYTES)
+            os.replace(token_risk_tmp_path, token_risk_file_path)
+            existing.add(token_risk_analysis_csv_name)
             logging.info(f"Reset {token_risk_analysis_csv_name} to header as part of first-run reset.")
         except Exception as e:
             logging.error(f"Error resetting {token_risk_analysis_csv_name} to header during first-run reset: {e}")
@@ -383,7 +484,7 @@ def initialize_all_files_once(script_dir_path):
     logging.info("Proceeding with standard file initialization checks...")
     
     files_to_initialize = {
-        results_file_1m_to_reset_name: ['Address','Name','Price USD','Liquidity(1m)','Volume(1m)','1m Change','Open Chart','Snipe','Ghost Buyer'],
+        results_file_1m_to_reset_name: _RESULTS_1M_HEADER_BYTES,
         # Files below have been disabled as per user request
         # "sniperx_results_5m.csv": ['Address','Name','Price USD','Liquidity(5m)','Volume(5m)','5m Change','Open Chart','Snipe','Ghost Buyer'],
         # "sniperx_prelim_filtered.csv": ['Address','Name','Price USD','Liquidity','Volume','Age (Minutes)','Created At','Open Chart'],
@@ -391,13 +492,13 @@ def initialize_all_files_once(script_dir_path):
         # "sniperx_whale_trap_5m.csv": ['Address','Name','Price USD','Liquidity(5m)','Volume(5m)','5m Change','Open Chart'],
         # "sniperx_ghost_buyer_1m.csv": ['Address','Name','Price USD','Liquidity(1m)','Volume(1m)','1m Change','Open Chart'],
         # "sniperx_ghost_buyer_5m.csv": ['Address','Name','Price USD','Liquidity(5m)','Volume(5m)','5m Change','Open Chart'],
-        "processed_tokens.txt": [], 
-        opened_tokens_file_to_reset_name: [], 
+        "processed_tokens.txt": b'', 
+        opened_tokens_file_to_reset_name: b'', 
         # Bubblemaps files disabled as per user request
         # "bubblemaps_processed.txt": [],
         # "bubblemaps_failed.txt": [],
         # "bubblemaps_cluster_summary.csv": ['Token Address', 'Cluster ID', 'Holder Count', 'Token Amount', 'Percentage of Supply', 'USD Value', 'Highest Risk Reason'],
-        token_risk_analysis_csv_name: token_risk_analysis_header,
+        token_risk_analysis_csv_name: _TOKEN_RISK_ANALYSIS_HEADER_BYTES,
     }
 
     sniperx_config_env_name = "sniperx_config.env"
@@ -429,7 +530,7 @@ def initialize_all_files_once(script_dir_path):
         "SLAVE_SCRIPT_NAME=\"Monitoring.py # Name of the slave script to monitor (not used by current watchdog)\"\n"
     )
     env_file_path = os.path.join(script_dir_path, sniperx_config_env_name)
-    if not os.path.exists(env_file_path):
+    if sniperx_config_env_name not in existing:
         try:
             with open(env_file_path, 'w', encoding='utf-8') as f_env:
                 f_env.write(sniperx_config_env_content)
@@ -437,22 +538,64 @@ def initialize_all_files_once(script_dir_path):
         except Exception as e:
             logging.error(f"Failed to create template file {sniperx_config_env_name}: {e}")
 
-    for filename, header_list_or_empty in files_to_initialize.items():
+    for filename, header_bytes in files_to_initialize.items():
         file_path = os.path.join(script_dir_path, filename)
-        if not os.path.exists(file_path): # Only create if it wasn't created/reset above
+        if filename not in existing: # Only create if it wasn't created/reset above
             try:
-                with open(file_path, 'w', newline='', encoding='utf-8') as f_generic:
-                    if header_list_or_empty:
-                        writer = csv.writer(f_generic)
-                        writer.writerow(header_list_or_empty)
-                        logging.info(f"Created CSV file with headers: {filename}")
-                    else:
-                        logging.info(f"Created empty file: {filename}")
+                with open(file_path, 'wb') as f_generic:
+                    f_generic.write(header_bytes)
+                if header_bytes:
+                    logging.info(f"Created CSV file with headers: {filename}")
+                else:
+                    logging.info(f"Created empty file: {filename}")
             except Exception as e:
                 logging.error(f"Failed to create template file {filename}: {e}")
     # --- END: Comprehensive File Initialization ---
     logging.info("File initialisation and template check complete.")
 
+def _pid_alive(pid):
+    """Return True if a process with this PID currently exists."""
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows, so probe with OpenProcess.
+        handle = ctypes.windll.kernel32.OpenProcess(_SYNCHRONIZE, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but owned by another user
+    except OSError:
+        return False
+    return True
+
+def _wait_pid_exit(pid, timeout):
+    """Block until PID exits or timeout seconds pass; returns True if it exited."""
+    if hasattr(os, 'pidfd_open'):
+        # Linux 5.3+: the pidfd becomes readable when the process exits, so wait in-kernel.
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                poller = select.poll()
+                poller.register(fd, select.POLLIN)
+                return bool(poller.poll(timeout * 1000))
+            finally:
+                os.close(fd)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not _pid_alive(pid):
+            return True
+        time.sleep(0.1)
+    return not _pid_alive(pid)
+
 def start_slave_watchdog(script_dir_path):
     slave_script_path = os.path.join(script_dir_path, 'run_testchrone_on_csv_change.py')
     pid_file = os.path.join(script_dir_path, 'testchrone_watchdog.pid')
@@ -465,18 +608,16 @@ def start_slave_watchdog(script_dir_path):
         try:
             with open(pid_file, 'r') as pf:
                 old_pid = int(pf.read().strip())
-            logging.info(f"Found previous watchdog PID {old_pid}. Attempting termination...")
-            os.kill(old_pid, signal.SIGTERM)
-            start_time = time.time()
-            while time.time() - start_time < 5:
-                try:
-                    os.kill(old_pid, 0)
-                    time.sleep(0.5)
-                except OSError:
-                    break
+            if not _pid_alive(old_pid):
+                logging.info(f"Previous watchdog PID {old_pid} is no longer running.")
             else:
-                os.kill(old_pid, signal.SIGKILL)
-                logging.info(f"Force killed watchdog PID {old_pid} after timeout.")
+                logging.info(f"Found previous watchdog PID {old_pid}. Attempting termination...")
+                os.kill(old_pid, signal.SIGTERM)
+                # On Windows os.kill maps SIGTERM to TerminateProcess, which is already final
+                # (and there is no SIGKILL to escalate to), so only POSIX needs the grace wait.
+                if os.name != 'nt' and not _wait_pid_exit(old_pid, 5):
+                    os.kill(old_pid, signal.SIGKILL)
+                    logging.info(f"Force killed watchdog PID {old_pid} after timeout.")
         except Exception as e:
             logging.info(f"Unable to terminate previous watchdog PID from file: {e}")
         finally:
@@ -487,14 +628,46 @@ def start_slave_watchdog(script_dir_path):
 
     try:
         process = subprocess.Popen([sys.executable, slave_script_path], cwd=script_dir_path)
-        with open(pid_file, 'w') as pf:
+        # Write-then-rename so a crash never leaves a truncated PID file behind.
+        tmp_pid_file = pid_file + '.tmp'
+        with open(tmp_pid_file, 'w') as pf:
             pf.write(str(process.pid))
+        os.replace(tmp_pid_file, pid_file)
         logging.info(f"Watchdog script '{slave_script_path}' started with PID {process.pid}.")
         return process
     except Exception as e:
         logging.error(f"Failed to start watchdog: {e}")
         return None
 
+class LockFileHandler(FileSystemEventHandler):
+    """Sets an event whenever the watched lock file is created, deleted or moved."""
+    def __init__(self, lock_file_path, changed_event):
+        super().__init__()
+        self.lock_file_path = os.path.abspath(lock_file_path)
+        self.changed_event = changed_event
+
+    def on_any_event(self, event):
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and os.path.abspath(os.fsdecode(path)) == self.lock_file_path:
+                self.changed_event.set()
+                return
+
+def start_lock_file_observer(lock_file_path, changed_event):
+    """Watch the lock file's directory; returns None when watchdog is unavailable."""
+    if Observer is None:
+        logging.warning("watchdog not installed; polling the monitoring lock file instead.")
+        return None
+    try:
+        observer = Observer()
+        observer.schedule(LockFileHandler(lock_file_path, changed_event),
+                          path=os.path.dirname(lock_file_path), recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+    except Exception as e:
+        logging.warning(f"Could not start lock file observer ({e}); polling instead.")
+        return None
+
 def main_token_processing_loop(script_dir_path):
     tokens = get_trending_tokens()
     prelim_filtered_tokens = filter_preliminary(tokens)
@@ -538,13 +711,26 @@ if __name__ == "__main__":
         
     monitoring_lock_file_path = os.path.join(SCRIPT_DIRECTORY, "monitoring_active.lock")
     check_interval_seconds = 3  # Short pause between lock checks
+    lock_wait_timeout_seconds = 30  # Safety-net recheck in case a filesystem event is missed
+    lock_changed = threading.Event()
+    lock_observer = start_lock_file_observer(monitoring_lock_file_path, lock_changed)
     try:
         while True:
             if os.path.exists(monitoring_lock_file_path):
+                if lock_observer is None:
+                    logging.info(
+                        f"Monitoring.py is active (lock file found: {monitoring_lock_file_path}). SniperX V2 pausing for {check_interval_seconds} seconds..."
+                    )
+                    time.sleep(check_interval_seconds)
+                    continue
                 logging.info(
-                    f"Monitoring.py is active (lock file found: {monitoring_lock_file_path}). SniperX V2 pausing for {check_interval_seconds} seconds..."
+                    f"Monitoring.py is active (lock file found: {monitoring_lock_file_path}). SniperX V2 waiting for it to be released..."
                 )
-                time.sleep(check_interval_seconds)
+                lock_changed.clear()
+                # Re-check after clearing so a delete between the two checks is not missed.
+                while os.path.exists(monitoring_lock_file_path):
+                    lock_changed.wait(timeout=lock_wait_timeout_seconds)
+                    lock_changed.clear()
                 continue
 
             logging.info(f"\n--- Starting new SniperX processing cycle at {datetime.datetime.now()} ---")
@@ -557,22 +743,29 @@ if __name__ == "__main__":
             except Exception as e_main_loop:
                 logging.error(f"Unhandled exception in main processing loop: {e_main_loop}", exc_info=True)
             
-            current_time_utc = datetime.datetime.now(datetime.timezone.utc)
-            if current_time_utc.minute == 0 and aggregated_results: 
+            # The cycle spans minutes, so this must be read after processing rather than reused from the start.
+            current_time_utc = datetime.datetime.now(datetime.timezone.utc) if aggregated_results else None
+            if current_time_utc is not None and current_time_utc.minute == 0: 
                 hr_ts = current_time_utc.strftime('%Y%m%d_%H00')
                 hr_fn = os.path.join(SCRIPT_DIRECTORY, f"sniperx_hourly_report_{hr_ts}.csv") 
                 logging.info(f"Writing hourly report to {hr_fn}")
+                hr_tmp_fn = hr_fn + '.tmp'
                 try:
-                    with open(hr_fn, 'w', newline='', encoding='utf-8') as hr_f: 
+                    url_prefix = f"https://dexscreener.com/{DEXSCREENER_CHAIN_ID}/"
+                    hr_rows = [
+                        [wm, cat_name, tk_item.get('tokenAddress','N/A'),
+                         sanitize_name(tk_item.get('name'),tk_item.get('symbol')),
+                         url_prefix + tk_item.get('tokenAddress','N/A')]
+                        for wm, cats_data in aggregated_results.items()
+                        for cat_name, tk_list in cats_data.items()
+                        for tk_item in tk_list
+                    ]
+                    # Large buffer so the whole report goes out in a few write() calls.
+                    with open(hr_tmp_fn, 'w', newline='', encoding='utf-8', buffering=HOURLY_REPORT_BUFFER_BYTES) as hr_f: 
                         w = csv.writer(hr_f)
                         w.writerow(['Window_Minutes','Category','Token_Address','Token_Name','DexScreener_URL'])
-                        for wm, cats_data in aggregated_results.items():
-                            for cat_name, tk_list in cats_data.items():
-                                for tk_item in tk_list:
-                                    addr = tk_item.get('tokenAddress','N/A')
-                                    name = sanitize_name(tk_item.get('name'),tk_item.get('symbol'))
-                                    url = f"https://dexscreener.com/{DEXSCREENER_CHAIN_ID}/{addr}"
-                                    w.writerow([wm,cat_name,addr,name,url])
+                        w.writerows(hr_rows)
+                    os.replace(hr_tmp_fn, hr_fn)
                 except Exception as e_rep: logging.error(f"Hourly report error: {e_rep}")
             
             logging.info(f"Rechecking monitoring lock in {check_interval_seconds}s...")
@@ -581,6 +774,9 @@ if __name__ == "__main__":
     except KeyboardInterrupt: 
         logging.info("\nKeyboardInterrupt. Shutting down SniperX V2...")
     finally:
+        if lock_observer is not None:
+            lock_observer.stop()
+            lock_observer.join(timeout=5)
         if monitoring_process and monitoring_process.poll() is None:
             logging.info("Terminating Monitoring.py process...")
             monitoring_process.terminate()
@@ -31,8 +31,9 @@ except Exception:
 risk_df.rename(columns={'Address': 'mint_address'}, inplace=True)
 
 # Calculate cumulative buy and sell counts per token
-trades['buy_flag'] = trades['buy_price'].notna() & (trades['buy_price'] != '')
-trades['sell_flag'] = trades['sell_price'].notna() & (trades['sell_price'] != '')
+# read_csv already turns empty fields into NaN, so notna() is the whole test; int8 keeps cumsum numeric
+trades['buy_flag'] = trades['buy_price'].notna().astype('int8')
+trades['sell_flag'] = trades['sell_price'].notna().astype('int8')
 trades.sort_values('timestamp', inplace=True)
 trades['buys'] = trades.groupby('mint_address')['buy_flag'].cumsum()
 trades['sells'] = trades.groupby('mint_address')['sell_flag'].cumsum()
@@ -48,15 +49,11 @@ if sniper_df is not None:
 merged['percent_value'] = pd.to_numeric(merged['percent'].str.rstrip('%'), errors='coerce')
 
 # Determine dump detection
-merged['dump_detected'] = False
-for mint, group in merged.groupby('mint_address'):
-    group = group.sort_values('timestamp')
-    pct = group['percent_value']
-    times = group['timestamp']
-    for i in range(1, len(group)):
-        if pd.notna(pct.iloc[i]) and pct.iloc[i] <= -10:
-            if (times.iloc[i] - times.iloc[i-1]) <= timedelta(minutes=3):
-                merged.loc[group.index[i], 'dump_detected'] = True
+# A row is a dump if it lost >=10% within 3 minutes of the previous trade on the same token
+ordered = merged.sort_values(['mint_address', 'timestamp'], kind='mergesort')
+dt = ordered.groupby('mint_address', sort=False)['timestamp'].diff()
+dump = (ordered['percent_value'] <= -10) & (dt <= timedelta(minutes=3))
+merged['dump_detected'] = dump.reindex(merged.index, fill_value=False)
 
 # Holders and price impact from risk data
 merged['holders'] = pd.to_numeric(merged.get('Cluster_Token_Amount_Est'), errors='coerce')
@@ -5,7 +5,6 @@
 
 import argparse
 import asyncio
-import base64
 from base58 import b58decode
 import json
 import os
@@ -14,11 +13,11 @@ from typing import List
 
 from dotenv import load_dotenv
 from solders.keypair import Keypair
+from solders.message import Message
 from solders.pubkey import Pubkey
 from solders.transaction import Transaction
-from solana.rpc.api import Client
+from solana.rpc.async_api import AsyncClient
 from solana.rpc.types import TokenAccountOpts, TxOpts
-from spl.token._layouts import ACCOUNT_LAYOUT
 from spl.token.constants import TOKEN_PROGRAM_ID
 from spl.token.instructions import (
     AuthorityType,
@@ -61,73 +60,91 @@ def load_keypair() -> Keypair:
     sys.exit(1)
 
 
-def decode_account(data: str) -> dict:
-    """Decode base64 account data using ACCOUNT_LAYOUT."""
-    decoded = ACCOUNT_LAYOUT.parse(base64.b64decode(data))
+def decode_account(info: dict) -> dict:
+    """Read the fields we act on from a jsonParsed SPL token account's info block."""
+    delegate = info.get("delegate")
+    close_authority = info.get("closeAuthority")
     return {
-        "mint": Pubkey(decoded.mint),
-        "owner": Pubkey(decoded.owner),
-        "amount": decoded.amount,
-        "delegate": None if decoded.delegate_option == 0 else Pubkey(decoded.delegate),
-        "delegated_amount": decoded.delegated_amount,
-        "close_authority": None
-        if decoded.close_authority_option == 0
-        else Pubkey(decoded.close_authority),
+        "mint": Pubkey.from_string(info["mint"]),
+        "owner": Pubkey.from_string(info["owner"]),
+        "amount": int(info["tokenAmount"]["amount"]),
+        "delegate": Pubkey.from_string(delegate) if delegate else None,
+        "delegated_amount": int((info.get("delegatedAmount") or {}).get("amount", 0)),
+        "close_authority": Pubkey.from_string(close_authority) if close_authority else None,
     }
 
 
-async def send_transaction(client: Client, tx: Transaction) -> str:
+# Solana caps a serialized transaction at 1232 bytes and a transaction at 64 instructions.
+PACKET_DATA_SIZE = 1232
+MAX_INSTRUCTIONS_PER_TX = 64
+MAX_CONCURRENT_SENDS = 8
+TX_OPTS = TxOpts(skip_preflight=False, skip_confirmation=False)
+TOKEN_PROGRAM_ID_STR = str(TOKEN_PROGRAM_ID)
+
+
+def serialized_tx_size(instructions: List, payer: Pubkey) -> int:
+    """Size in bytes of a transaction carrying these instructions, signatures included."""
+    # An unsigned transaction serializes zeroed signature slots, so its length matches the signed one.
+    return len(bytes(Transaction.new_unsigned(Message(instructions, payer))))
+
+
+def pack_instructions(groups: List[List], payer: Pubkey, max_tx_bytes: int, max_per_tx: int) -> List[List]:
+    """Greedily fill each transaction until the next group would break the byte or count limit.
+
+    Each group holds one account's instructions and is never split, so every transaction
+    touches a disjoint set of accounts and the transactions can land in any order.
+    """
+    batches: List[List] = []
+    current: List = []
+    for group in groups:
+        candidate = current + group
+        if current and (len(candidate) > max_per_tx or serialized_tx_size(candidate, payer) > max_tx_bytes):
+            batches.append(current)
+            candidate = list(group)
+        current = candidate
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def send_transaction(client: AsyncClient, tx: Transaction, semaphore: asyncio.Semaphore) -> str:
     """Send transaction and confirm within 30 seconds."""
-    resp = await asyncio.to_thread(
-        client.send_transaction,
-        tx,
-        opts=TxOpts(skip_preflight=False, skip_confirmation=False),
-    )
+    async with semaphore:
+        resp = await client.send_transaction(tx, opts=TX_OPTS)
     sig = str(resp.value)
     return sig
 
 
-async def main() -> None:
-    """Entry point for the script."""
-    load_dotenv()
-    parser = argparse.ArgumentParser(description="Revoke delegates and close token accounts")
-    parser.add_argument(
-        "--endpoint",
-        default="https://api.mainnet-beta.solana.com",
-        help="RPC endpoint to use",
-    )
-    parser.add_argument(
-        "--dry-run",
-        action="store_true",
-        help="Only print actions without sending transactions",
-    )
-    parser.add_argument(
-        "--max-per-tx",
-        type=int,
-        default=10,
-        help="Max instructions per transaction",
-    )
-    args = parser.parse_args()
-
-    keypair = load_keypair()
+async def process_accounts(client: AsyncClient, keypair: Keypair, args: argparse.Namespace) -> None:
+    """Queue revoke/close instructions for every token account and send them."""
     owner = keypair.pubkey()
-    client = Client(args.endpoint)
 
     # Fetch all token accounts owned by our keypair
-    opts = TokenAccountOpts(program_id=str(TOKEN_PROGRAM_ID))
-    resp = client.get_token_accounts_by_owner(owner, opts)
+    opts = TokenAccountOpts(program_id=TOKEN_PROGRAM_ID_STR)
+    if args.dry_run:
+        resp = await client.get_token_accounts_by_owner_json_parsed(owner, opts)
+        bh = None
+    else:
+        # Both RPCs are independent: issue them together so the blockhash costs no extra round trip.
+        resp, bh_resp = await asyncio.gather(
+            client.get_token_accounts_by_owner_json_parsed(owner, opts),
+            client.get_latest_blockhash(),
+        )
+        bh = bh_resp.value
     accounts = resp.value
 
     revoke_count = 0
     close_count = 0
     recovered_lamports = 0
 
-    instr_queue: List = []
+    # One list of instructions per account, kept together when batching
+    instr_groups: List[List] = []
 
     for acc in accounts:
         acc_pubkey = acc.pubkey
-        info = decode_account(acc.account.data.decode("utf-8"))
+        info = decode_account(acc.account.data.parsed["info"])
         lamports = acc.account.lamports
+        instr_queue: List = []
 
         # Check delegate
         if info["delegate"] and info["delegate"] != owner:
@@ -140,6 +157,7 @@ async def main() -> None:
                         signers=[],
                     )
                 )
+            )
             revoke_count += 1
 
         # Close authority not self
@@ -155,6 +173,7 @@ async def main() -> None:
                         new_authority=owner,
                     )
                 )
+            )
             # Not counting separately
 
         # Close account if empty
@@ -169,28 +188,74 @@ async def main() -> None:
                         signers=[],
                     )
                 )
+            )
             close_count += 1
             recovered_lamports += lamports
 
+        if instr_queue:
+            instr_groups.append(instr_queue)
+
     if args.dry_run:
-        print(f"Would send {len(instr_queue)} instructions")
+        print(f"Would send {sum(len(group) for group in instr_groups)} instructions")
         print(f"Revoke: {revoke_count}, Close: {close_count}, Recovered lamports: {recovered_lamports}")
         return
 
-    # Batch instructions into transactions
-    batch_size = args.max_per_tx
-    batches = [instr_queue[i : i + batch_size] for i in range(0, len(instr_queue), batch_size)]
+    # Batch instructions into as few transactions as the size and count limits allow
+    max_per_tx = min(args.max_per_tx, MAX_INSTRUCTIONS_PER_TX)
+    max_tx_bytes = min(args.max_tx_bytes, PACKET_DATA_SIZE)
+    batches = pack_instructions(instr_groups, owner, max_tx_bytes, max_per_tx)
 
-    for batch in batches:
-        bh = client.get_latest_blockhash().value
-        tx = Transaction.new_signed_with_payer(batch, owner, [keypair], bh.blockhash)
-        sig = await send_transaction(client, tx)
-        print(f"Tx: {sig} https://solscan.io/tx/{sig}")
+    # An account's instructions never span two batches, so the batches touch disjoint accounts:
+    # sign them all against one blockhash and send them together.
+    signed_txs = [Transaction.new_signed_with_payer(batch, owner, [keypair], bh.blockhash) for batch in batches]
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+    results = await asyncio.gather(
+        *(send_transaction(client, tx, semaphore) for tx in signed_txs),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Tx failed: {result}", file=sys.stderr)
+        else:
+            print(f"Tx: {result} https://solscan.io/tx/{result}")
 
     print(f"Revoked {revoke_count} delegates")
     print(f"Closed {close_count} accounts")
     print(f"Recovered {recovered_lamports / 1_000_000_000:.9f} SOL")
 
 
+async def main() -> None:
+    """Entry point for the script."""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Revoke delegates and close token accounts")
+    parser.add_argument(
+        "--endpoint",
+        default="https://api.mainnet-beta.solana.com",
+        help="RPC endpoint to use",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print actions without sending transactions",
+    )
+    parser.add_argument(
+        "--max-per-tx",
+        type=int,
+        default=MAX_INSTRUCTIONS_PER_TX,
+        help="Max instructions per transaction",
+    )
+    parser.add_argument(
+        "--max-tx-bytes",
+        type=int,
+        default=1200,
+        help=f"Max serialized transaction size in bytes (network limit {PACKET_DATA_SIZE})",
+    )
+    args = parser.parse_args()
+
+    keypair = load_keypair()
+    async with AsyncClient(args.endpoint) as client:
+        await process_accounts(client, keypair, args)
+
+
 if __name__ == "__main__":
     asyncio.run(main())
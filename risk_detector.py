@@ -1,10 +1,20 @@
+import asyncio
 import csv
+import json
 import math
-import requests
-import time
+import aiohttp
 import os
+import random
+import shutil
+import sqlite3
 import sys 
+import time
 import logging
+try:
+    import orjson  # Optional: decodes large DexScreener pair lists several times faster
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] [%(filename)s:%(lineno)d] - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
@@ -15,7 +25,30 @@ DUMP_RISK_THRESHOLD_LP_VS_CLUSTER = 25.0
 PRICE_IMPACT_THRESHOLD_CLUSTER_SELL = 30.0 
 TOTAL_SUPPLY = 1_000_000_000 
 DEXSCREENER_API_ENDPOINT_TEMPLATE = "https://api.dexscreener.com/v1/dex/tokens/{token_address}" 
+# Base URLs tried in order; extra mirrors/proxies can be supplied comma-separated via DEXSCREENER_BASE_URLS.
+DEXSCREENER_BASE_URLS = [u.strip().rstrip("/") for u in os.getenv("DEXSCREENER_BASE_URLS", "https://api.dexscreener.com").split(",") if u.strip()]
+DEXSCREENER_SEARCH_PATH_TEMPLATE = "/latest/dex/search?q={token_address}"
+DEXSCREENER_BATCH_PATH_TEMPLATE = "/tokens/v1/{chain_id}/{addresses}"
+DEXSCREENER_MAX_ATTEMPTS = 3
+DEXSCREENER_BACKOFF_BASE_SECONDS = 0.5
+DEXSCREENER_BATCH_SIZE = 30  # DexScreener accepts at most 30 comma-separated addresses per call
 REQUESTS_TIMEOUT = 15 
+DEXSCREENER_RATE_LIMIT_PER_MINUTE = 300  # DexScreener's published per-IP budget
+DEXSCREENER_MAX_CONNECTIONS = 20
+# Lowercased quote symbols whose pairs are preferred as a token's primary pool
+COMMON_QUOTE_SYMBOLS = frozenset(q_sym.lower() for q_sym in ("SOL", "USDC", "USDT", "JUP", "RAY", "BONK", "WIF"))
+POOL_DATA_CACHE_TTL_SECONDS = 60  # Reuse a token's DexScreener lookup within this window, across runs
+
+# Placeholder values for the risk columns until DexScreener/cluster data fills them in
+RISK_COLUMN_DEFAULTS = {
+    "Global_Cluster_Percentage": "N/A", "Highest_Risk_Reason_Cluster": "N/A",
+    "DexScreener_Pair_Address": "N/A", "DexScreener_Liquidity_USD": "N/A", 
+    "DexScreener_Token_Price_USD": "N/A", "DexScreener_Token_Name": "N/A",
+    "LP_Percent_Supply": "N/A", "Cluster_Token_Amount_Est": "N/A", 
+    "Pool_Project_Token_Amount_Est": "N/A",
+    "Dump_Risk_LP_vs_Cluster_Ratio": "N/A", "Price_Impact_Cluster_Sell_Percent": "N/A",
+    "Overall_Risk_Status": "Data N/A", "Risk_Warning_Details": ""
+}
 
 # --- File Paths (assuming in the same directory as the script) ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,104 +58,242 @@ OUTPUT_RISK_ANALYSIS_CSV = os.path.join(SCRIPT_DIR, "token_risk_analysis.csv")
 FILTERED_TOKENS_WITH_ALL_RISKS_CSV = os.path.join(
     SCRIPT_DIR, "filtered_tokens_with_all_risks.csv"
 )
+POOL_DATA_CACHE_DB = os.path.join(SCRIPT_DIR, "dex_cache.db")
 
 # --- Helper Functions ---
-def get_primary_pool_data_from_dexscreener(token_address, chain_id="solana"):
-    search_url = f"https://api.dexscreener.com/latest/dex/search?q={token_address}"
-    logging.info(f"[DEXSCREENER] Querying for pairs: {search_url}")
-    try:
-        response = requests.get(search_url, headers={"Accept": "*/*"}, timeout=REQUESTS_TIMEOUT)
-        response.raise_for_status()
-        data = response.json()
+def select_primary_pool_data(pair_list, token_address, chain_id="solana"):
+    """Pick the token's primary pair from DexScreener pairs; returns (liquidity, price, pair address, name)."""
+    if not pair_list:
+        logging.info("[DEXSCREENER] No pairs found for %s.", token_address)
+        return None, None, None, None
 
-        if not isinstance(data, dict) or "pairs" not in data or not isinstance(data["pairs"], list):
-            logging.warning(f"[DEXSCREENER] Unrecognized DexScreener response structure for {token_address}. Response: {str(data)[:200]}")
-            return None, None, None, None
-        
-        pair_list = data["pairs"]
-        if not pair_list:
-            logging.info(f"[DEXSCREENER] No pairs found for {token_address}.")
-            return None, None, None, None
+    token_addr_lower = token_address.lower()
+    chain_id_lower = chain_id.lower()
+
+    candidates = []  # (is_preferred_quote, liquidity_usd, pair, token_name)
+    for current_pair_data in pair_list:
+        if not isinstance(current_pair_data, dict):
+            continue
+        if current_pair_data.get("chainId", "").lower() != chain_id_lower:
+            continue
 
-        best_pair = None
-        highest_liquidity_usd = -1.0
-        common_quote_symbols = ["SOL", "USDC", "USDT", "JUP", "RAY", "BONK", "WIF"] 
+        base_token = current_pair_data.get("baseToken") or {}
+        quote_token = current_pair_data.get("quoteToken") or {}
+        base_token_addr = (base_token.get("address") or "").lower()
+        quote_token_addr = (quote_token.get("address") or "").lower()
+
+        # Remember which side is ours now so the winner's name needs no second address comparison
+        if token_addr_lower == base_token_addr:
+            other_token_symbol = quote_token.get("symbol", "")
+            token_name = base_token.get("name", "")
+        elif token_addr_lower == quote_token_addr:
+            other_token_symbol = base_token.get("symbol", "")
+            token_name = quote_token.get("name", "")
+        else:
+            continue 
 
-        for current_pair_data in pair_list:
-            if not isinstance(current_pair_data, dict):
-                continue
-            if current_pair_data.get("chainId", "").lower() != chain_id.lower():
-                continue
-            
-            base_token_addr = current_pair_data.get("baseToken", {}).get("address", "").lower()
-            quote_token_addr = current_pair_data.get("quoteToken", {}).get("address", "").lower()
-            token_addr_lower = token_address.lower()
-
-            if token_addr_lower != base_token_addr and token_addr_lower != quote_token_addr:
-                continue 
-
-            current_liquidity_usd = 0.0
-            liquidity_info = current_pair_data.get("liquidity")
-            if liquidity_info and isinstance(liquidity_info, dict) and liquidity_info.get("usd") is not None:
-                try:
-                    current_liquidity_usd = float(liquidity_info["usd"])
-                except (ValueError, TypeError):
-                    current_liquidity_usd = 0.0
-            
-            other_token_symbol = ""
-            if token_addr_lower == base_token_addr:
-                other_token_symbol = current_pair_data.get("quoteToken", {}).get("symbol", "")
-            elif token_addr_lower == quote_token_addr:
-                 other_token_symbol = current_pair_data.get("baseToken", {}).get("symbol", "")
-            
-            is_current_preferred_quote = any(q_sym.lower() == (other_token_symbol or "").lower() for q_sym in common_quote_symbols)
-
-            is_best_pair_preferred_quote = False
-            if best_pair:
-                bp_base_token_addr = best_pair.get("baseToken", {}).get("address", "").lower()
-                bp_other_symbol = ""
-                if token_addr_lower == bp_base_token_addr:
-                    bp_other_symbol = best_pair.get("quoteToken", {}).get("symbol", "")
-                else:
-                    bp_other_symbol = best_pair.get("baseToken", {}).get("symbol", "")
-                is_best_pair_preferred_quote = any(q_sym.lower() == (bp_other_symbol or "").lower() for q_sym in common_quote_symbols)
-
-            if best_pair is None or \
-               (is_current_preferred_quote and not is_best_pair_preferred_quote) or \
-               (is_current_preferred_quote == is_best_pair_preferred_quote and current_liquidity_usd > highest_liquidity_usd) or \
-               (not is_current_preferred_quote and not is_best_pair_preferred_quote and current_liquidity_usd > highest_liquidity_usd): 
-                best_pair = current_pair_data
-                highest_liquidity_usd = current_liquidity_usd
+        current_liquidity_usd = 0.0
+        liquidity_info = current_pair_data.get("liquidity")
+        if liquidity_info and isinstance(liquidity_info, dict) and liquidity_info.get("usd") is not None:
+            try:
+                current_liquidity_usd = float(liquidity_info["usd"])
+            except (ValueError, TypeError):
+                current_liquidity_usd = 0.0
+
+        is_current_preferred_quote = (other_token_symbol or "").lower() in COMMON_QUOTE_SYMBOLS
+        candidates.append((is_current_preferred_quote, current_liquidity_usd, current_pair_data, token_name))
+
+    # Preferred quote tokens win outright; within a class the deepest pool wins, ties keep the earliest pair.
+    best = max(candidates, key=lambda c: (c[0], c[1]), default=None)
         
-        if not best_pair:
-            logging.info(f"[DEXSCREENER] No suitable primary pair found for {token_address} on {chain_id} after filtering.")
-            return None, None, None, None
+    if not best:
+        logging.info("[DEXSCREENER] No suitable primary pair found for %s on %s after filtering.", token_address, chain_id)
+        return None, None, None, None
 
-        pair_address_dex = best_pair.get("pairAddress")
-        liquidity_usd_dex = highest_liquidity_usd
-        price_usd_str = best_pair.get("priceUsd", "0")
+    _, liquidity_usd_dex, best_pair, token_name_dex = best
+    pair_address_dex = best_pair.get("pairAddress")
+    price_usd_str = best_pair.get("priceUsd", "0")
+    try:
+        price_usd_dex = float(price_usd_str)
+    except (ValueError, TypeError):
+        logging.warning("[DEXSCREENER] Could not parse priceUsd '%s' for %s. Defaulting to 0.", price_usd_str, token_address)
+        price_usd_dex = 0.0
+
+    logging.info("[DEXSCREENER] Primary pair for %s: %s, Liq_USD: %.2f, Price_USD: %.8f", token_address, pair_address_dex, liquidity_usd_dex, price_usd_dex)
+    return liquidity_usd_dex, price_usd_dex, pair_address_dex, token_name_dex
+
+class RateLimiter:
+    """Spaces request start times evenly so at most `rate` requests begin per `period` seconds."""
+    def __init__(self, rate, period):
+        self.interval = period / rate
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        # No await between reading and advancing the slot, so concurrent callers never share one.
+        now = asyncio.get_running_loop().time()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+_dexscreener_limiter = RateLimiter(DEXSCREENER_RATE_LIMIT_PER_MINUTE, 60)
+_active_base_url_index = 0  # Index of the last base URL that answered successfully
+
+async def dexscreener_get_json(session, path):
+    """GET a DexScreener path with retries, rotating base URLs on 429/5xx/timeouts; raises the last error."""
+    global _active_base_url_index
+    last_error = None
+    for attempt in range(DEXSCREENER_MAX_ATTEMPTS):
+        index = (_active_base_url_index + attempt) % len(DEXSCREENER_BASE_URLS)
+        await _dexscreener_limiter.acquire()
         try:
-            price_usd_dex = float(price_usd_str)
-        except (ValueError, TypeError):
-            logging.warning(f"[DEXSCREENER] Could not parse priceUsd '{price_usd_str}' for {token_address}. Defaulting to 0.")
-            price_usd_dex = 0.0
-        
-        token_name_dex = ""
-        if best_pair.get("baseToken", {}).get("address", "").lower() == token_address.lower():
-            token_name_dex = best_pair.get("baseToken", {}).get("name", "")
-        elif best_pair.get("quoteToken", {}).get("address", "").lower() == token_address.lower():
-             token_name_dex = best_pair.get("quoteToken", {}).get("name", "") 
+            async with session.get(DEXSCREENER_BASE_URLS[index] + path, headers={"Accept": "*/*"}) as response:
+                response.raise_for_status()
+                data = _json_loads(await response.read())
+            _active_base_url_index = index
+            return data
+        except aiohttp.ClientResponseError as e:
+            if e.status != 429 and e.status < 500:
+                raise
+            last_error = e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_error = e
+        if attempt + 1 < DEXSCREENER_MAX_ATTEMPTS:
+            delay = DEXSCREENER_BACKOFF_BASE_SECONDS * (2 ** attempt)
+            logging.warning("[DEXSCREENER] %s failed on %s (%s); retrying in ~%.1fs", path, DEXSCREENER_BASE_URLS[index], last_error, delay)
+            await asyncio.sleep(delay + random.uniform(0, delay))
+    raise last_error
+
+async def get_primary_pool_data_from_dexscreener(session, token_address, chain_id="solana"):
+    search_path = DEXSCREENER_SEARCH_PATH_TEMPLATE.format(token_address=token_address)
+    logging.info("[DEXSCREENER] Querying for pairs: %s", search_path)
+    try:
+        data = await dexscreener_get_json(session, search_path)
 
-        logging.info(f"[DEXSCREENER] Primary pair for {token_address}: {pair_address_dex}, Liq_USD: {liquidity_usd_dex:.2f}, Price_USD: {price_usd_dex:.8f}")
-        return liquidity_usd_dex, price_usd_dex, pair_address_dex, token_name_dex
+        if not isinstance(data, dict) or "pairs" not in data or not isinstance(data["pairs"], list):
+            logging.warning("[DEXSCREENER] Unrecognized DexScreener response structure for %s. Response: %s", token_address, str(data)[:200])
+            return None, None, None, None
+        return select_primary_pool_data(data["pairs"], token_address, chain_id)
 
-    except requests.exceptions.RequestException as e:
-        logging.error(f"[DEXSCREENER] API request failed for {token_address}: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error("[DEXSCREENER] API request failed for %s: %s", token_address, e)
         return None, None, None, None
     except ValueError as e: 
-        logging.error(f"[DEXSCREENER] Failed to decode JSON response for {token_address}: {e}")
+        logging.error("[DEXSCREENER] Failed to decode JSON response for %s: %s", token_address, e)
         return None, None, None, None
 
+async def fetch_pairs_batch(session, addresses, chain_id="solana"):
+    """Fetch all pairs for up to DEXSCREENER_BATCH_SIZE tokens in one request; None on failure."""
+    batch_path = DEXSCREENER_BATCH_PATH_TEMPLATE.format(chain_id=chain_id, addresses=",".join(addresses))
+    logging.info("[DEXSCREENER] Querying pairs for %s tokens: %s", len(addresses), batch_path)
+    try:
+        data = await dexscreener_get_json(session, batch_path)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error("[DEXSCREENER] Batch request failed for %s tokens: %s", len(addresses), e)
+        return None
+    except ValueError as e:
+        logging.error("[DEXSCREENER] Failed to decode batch JSON response: %s", e)
+        return None
+    if not isinstance(data, list):
+        logging.warning("[DEXSCREENER] Unrecognized batch response structure. Response: %s", str(data)[:200])
+        return None
+    return data
+
+def open_pool_data_cache(path=POOL_DATA_CACHE_DB):
+    """Open the on-disk DexScreener lookup cache shared between runs; None if it cannot be used."""
+    try:
+        conn = sqlite3.connect(path, timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pool_data ("
+            "address TEXT PRIMARY KEY, pair_address TEXT, token_name TEXT, "
+            "liquidity_usd REAL, price_usd REAL, fetched_at REAL)"
+        )
+        return conn
+    except sqlite3.Error as e:
+        logging.warning("[DEXSCREENER] Pool data cache %s unavailable, fetching everything: %s", path, e)
+        return None
+
+async def fetch_all_pool_data(token_addresses, cache_path=POOL_DATA_CACHE_DB):
+    """Return pool data for all addresses, only hitting DexScreener for ones not looked up recently."""
+    # Wall-clock time: entries are written by earlier processes, so a monotonic clock would not compare.
+    now = time.time()
+    results = {}
+    conn = open_pool_data_cache(cache_path)
+    if conn is not None:
+        try:
+            with conn:
+                conn.execute("DELETE FROM pool_data WHERE fetched_at < ?", (now - POOL_DATA_CACHE_TTL_SECONDS,))
+            for addr in token_addresses:
+                row = conn.execute(
+                    "SELECT liquidity_usd, price_usd, pair_address, token_name FROM pool_data WHERE address = ?",
+                    (addr,),
+                ).fetchone()
+                if row:
+                    results[addr] = row
+        except sqlite3.Error as e:
+            logging.warning("[DEXSCREENER] Could not read pool data cache: %s", e)
+            results = {}
+    to_fetch = [addr for addr in token_addresses if addr not in results]
+    if to_fetch:
+        logging.info("[DEXSCREENER] %s tokens cached, fetching %s.", len(results), len(to_fetch))
+        fetched = await fetch_pool_data_from_dexscreener(to_fetch)
+        results.update(fetched)
+        if conn is not None:
+            fetched_at = time.time()
+            try:
+                with conn:
+                    # Failed lookups are retried next time rather than cached
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO pool_data VALUES (?, ?, ?, ?, ?, ?)",
+                        [(addr, pair_addr, name, liq, price, fetched_at)
+                         for addr, (liq, price, pair_addr, name) in fetched.items() if liq is not None],
+                    )
+            except sqlite3.Error as e:
+                logging.warning("[DEXSCREENER] Could not update pool data cache: %s", e)
+    if conn is not None:
+        conn.close()
+    return results
+
+async def fetch_pool_data_from_dexscreener(token_addresses):
+    """Fetch DexScreener pool data for all addresses, 30 tokens per request, batches run concurrently."""
+    batches = [token_addresses[i:i + DEXSCREENER_BATCH_SIZE]
+               for i in range(0, len(token_addresses), DEXSCREENER_BATCH_SIZE)]
+    timeout = aiohttp.ClientTimeout(total=REQUESTS_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=DEXSCREENER_MAX_CONNECTIONS, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        batch_results = await asyncio.gather(*(fetch_pairs_batch(session, batch) for batch in batches))
+
+        results = {}
+        unresolved = []
+        for batch, pairs in zip(batches, batch_results):
+            if pairs is None:
+                unresolved.extend(batch)
+                continue
+            # A pair belongs to every requested token it trades, whether as base or quote.
+            wanted = {addr.lower() for addr in batch}
+            pairs_by_token = {}
+            for pair in pairs:
+                if not isinstance(pair, dict):
+                    continue
+                for side in ("baseToken", "quoteToken"):
+                    side_addr = ((pair.get(side) or {}).get("address") or "").lower()
+                    if side_addr in wanted:
+                        pairs_by_token.setdefault(side_addr, []).append(pair)
+            for addr in batch:
+                token_pairs = pairs_by_token.get(addr.lower())
+                if token_pairs:
+                    results[addr] = select_primary_pool_data(token_pairs, addr)
+                else:
+                    unresolved.append(addr)
+
+        # Tokens the batch endpoint missed (or whose batch failed) fall back to the per-token search.
+        if unresolved:
+            logging.info("[DEXSCREENER] Falling back to search for %s tokens.", len(unresolved))
+            fallback = await asyncio.gather(*(get_primary_pool_data_from_dexscreener(session, addr)
+                                              for addr in unresolved))
+            results.update(zip(unresolved, fallback))
+    return results
+
 def calculate_lp_percent(liquidity_usd_in_pool, token_price_usd):
     if token_price_usd is None or token_price_usd == 0 or liquidity_usd_in_pool is None:
         return 0.0
@@ -133,7 +304,7 @@ def calculate_lp_percent(liquidity_usd_in_pool, token_price_usd):
 
 def calculate_dump_risk_lp_vs_cluster(cluster_percent_supply, lp_percent_supply):
     if lp_percent_supply is None or lp_percent_supply == 0:
-        return float('inf') if cluster_percent_supply > 0 else 0.0 
+        return math.inf if cluster_percent_supply > 0 else 0.0 
     if cluster_percent_supply is None: return 0.0
     return (cluster_percent_supply / lp_percent_supply) * 100 
 
@@ -156,7 +327,7 @@ def calculate_price_impact_cluster_sell(pool_project_token_amount, cluster_sell_
 
 def load_cluster_summaries(path):
     if not os.path.exists(path):
-        logging.error(f"Cluster summary file not found at {path}")
+        logging.error("Cluster summary file not found at %s", path)
         return {}
     summaries = {}
     try:
@@ -166,17 +337,17 @@ def load_cluster_summaries(path):
                 if 'Token_Address' in row:
                     summaries[row['Token_Address']] = row
                 else:
-                    logging.warning(f"Skipping row in cluster summary due to missing 'Token_Address': {row}")
-            logging.info(f"Successfully loaded {len(summaries)} entries from {path}")
+                    logging.warning("Skipping row in cluster summary due to missing 'Token_Address': %s", row)
+            logging.info("Successfully loaded %s entries from %s", len(summaries), path)
     except Exception as e:
-        logging.error(f"Error loading cluster summaries from {path}: {e}", exc_info=True)
+        logging.error("Error loading cluster summaries from %s: %s", path, e, exc_info=True)
     return summaries
 
 def run_full_risk_analysis():
     logging.info("--- Starting Full Token Risk Analysis ---")
 
     if not os.path.exists(INPUT_TOKENS_CSV):
-        logging.error(f"Input tokens file not found: {INPUT_TOKENS_CSV}. Aborting.")
+        logging.error("Input tokens file not found: %s. Aborting.", INPUT_TOKENS_CSV)
         return
     
     input_tokens = []
@@ -187,9 +358,9 @@ def run_full_risk_analysis():
             input_headers = reader.fieldnames if reader.fieldnames else []
             for row in reader:
                 input_tokens.append(row)
-        logging.info(f"Loaded {len(input_tokens)} tokens from {INPUT_TOKENS_CSV}")
+        logging.info("Loaded %s tokens from %s", len(input_tokens), INPUT_TOKENS_CSV)
     except Exception as e:
-        logging.error(f"Error loading input tokens from {INPUT_TOKENS_CSV}: {e}", exc_info=True)
+        logging.error("Error loading input tokens from %s: %s", INPUT_TOKENS_CSV, e, exc_info=True)
         return
 
     if not input_tokens:
@@ -208,29 +379,24 @@ def run_full_risk_analysis():
         "Dump_Risk_LP_vs_Cluster_Ratio", "Price_Impact_Cluster_Sell_Percent",
         "Overall_Risk_Status", "Risk_Warning_Details"
     ]
-    output_headers = sorted(list(set(output_headers)), key=output_headers.index) 
+    output_headers = list(dict.fromkeys(output_headers))
+
+    token_addresses = list(dict.fromkeys(row["Address"] for row in input_tokens if row.get("Address")))
+    pool_data_map = asyncio.run(fetch_all_pool_data(token_addresses))
 
     for token_row in input_tokens:
         output_row = {header: token_row.get(header, "") for header in input_headers} 
         token_address = token_row.get("Address")
 
         if not token_address:
-            logging.warning(f"Skipping row due to missing 'Address': {token_row}")
+            logging.warning("Skipping row due to missing 'Address': %s", token_row)
             for risk_header in output_headers[len(input_headers):]: output_row[risk_header] = "N/A"
             results_to_write.append(output_row)
             continue
         
-        logging.info(f"Processing token: {token_address} ({token_row.get('Name', 'N/A')})")
-
-        output_row.update({
-            "Global_Cluster_Percentage": "N/A", "Highest_Risk_Reason_Cluster": "N/A",
-            "DexScreener_Pair_Address": "N/A", "DexScreener_Liquidity_USD": "N/A", 
-            "DexScreener_Token_Price_USD": "N/A", "DexScreener_Token_Name": "N/A",
-            "LP_Percent_Supply": "N/A", "Cluster_Token_Amount_Est": "N/A", 
-            "Pool_Project_Token_Amount_Est": "N/A",
-            "Dump_Risk_LP_vs_Cluster_Ratio": "N/A", "Price_Impact_Cluster_Sell_Percent": "N/A",
-            "Overall_Risk_Status": "Data N/A", "Risk_Warning_Details": ""
-        })
+        logging.info("Processing token: %s (%s)", token_address, token_row.get('Name', 'N/A'))
+
+        output_row.update(RISK_COLUMN_DEFAULTS)
 
         cluster_info = cluster_data_map.get(token_address)
         cluster_percent_supply_val = 0.0
@@ -240,14 +406,13 @@ def run_full_risk_analysis():
             try:
                 cluster_percent_supply_val = float(output_row["Global_Cluster_Percentage"])
             except ValueError:
-                logging.warning(f"Could not parse Global_Cluster_Percentage '{output_row['Global_Cluster_Percentage']}' for {token_address}. Defaulting to 0.0 for calculations.")
+                logging.warning("Could not parse Global_Cluster_Percentage '%s' for %s. Defaulting to 0.0 for calculations.", output_row['Global_Cluster_Percentage'], token_address)
                 cluster_percent_supply_val = 0.0
         else:
-            logging.info(f"No cluster summary found for {token_address}.")
+            logging.info("No cluster summary found for %s.", token_address)
             output_row["Highest_Risk_Reason_Cluster"] = "Cluster data not found"
 
-        time.sleep(0.2) 
-        liquidity_usd, price_usd, pair_addr, token_name_dex = get_primary_pool_data_from_dexscreener(token_address)
+        liquidity_usd, price_usd, pair_addr, token_name_dex = pool_data_map[token_address]
 
         risk_warnings = []
         if liquidity_usd is not None and price_usd is not None and pair_addr is not None:
@@ -294,59 +459,43 @@ def run_full_risk_analysis():
 
     if results_to_write:
         try:
-            # Write to token_risk_analysis.csv
-            with open(OUTPUT_RISK_ANALYSIS_CSV, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=output_headers, quoting=csv.QUOTE_NONNUMERIC)
-                writer.writeheader()
-                for row in results_to_write:
-                    try:
-                        writer.writerow(row)
-                    except Exception as row_error:
-                        logging.error(f"Error writing row to {OUTPUT_RISK_ANALYSIS_CSV}: {row_error}\nRow data: {row}")
-                        continue
-
-            # Write to filtered_tokens_with_all_risks.csv
-            with open(FILTERED_TOKENS_WITH_ALL_RISKS_CSV, 'w', newline='', encoding='utf-8') as f_filtered:
-                filtered_writer = csv.DictWriter(f_filtered, fieldnames=output_headers, quoting=csv.QUOTE_NONNUMERIC)
-                filtered_writer.writeheader()
-                for row in results_to_write:
-                    try:
-                        filtered_writer.writerow(row)
-                    except Exception as row_error:
-                        logging.error(f"Error writing row to {FILTERED_TOKENS_WITH_ALL_RISKS_CSV}: {row_error}\nRow data: {row}")
-                        continue
-
-            logging.info(f"Successfully wrote {len(results_to_write)} processed token entries to {OUTPUT_RISK_ANALYSIS_CSV} and {FILTERED_TOKENS_WITH_ALL_RISKS_CSV}")
+            # Lay rows out in header order once; DictWriter would redo the field lookups per row.
+            rows = [[row.get(header, "") for header in output_headers] for row in results_to_write]
+            # Build the file beside the target and swap it in, so Monitoring never reads a half-written CSV
+            tmp_output_path = OUTPUT_RISK_ANALYSIS_CSV + ".tmp"
+            with open(tmp_output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+                writer.writerow(output_headers)
+                writer.writerows(rows)
+            rows_written = len(rows)
+
+            # filtered_tokens_with_all_risks.csv carries the same rows, so copy the file instead of re-encoding them
+            shutil.copyfile(tmp_output_path, FILTERED_TOKENS_WITH_ALL_RISKS_CSV)
+            os.replace(tmp_output_path, OUTPUT_RISK_ANALYSIS_CSV)
+
+            logging.info("Successfully wrote %s processed token entries to %s and %s", len(results_to_write), OUTPUT_RISK_ANALYSIS_CSV, FILTERED_TOKENS_WITH_ALL_RISKS_CSV)
             
             # Clean up input files
             try:
                 # Remove processed tokens from sniperx_results_1m.csv
                 if os.path.exists(INPUT_TOKENS_CSV):
                     os.remove(INPUT_TOKENS_CSV)
-                    logging.info(f"Removed processed tokens from {INPUT_TOKENS_CSV}")
+                    logging.info("Removed processed tokens from %s", INPUT_TOKENS_CSV)
                 
                 # Clean up cluster_summaries.csv
                 if os.path.exists(CLUSTER_SUMMARY_CSV):
                     os.remove(CLUSTER_SUMMARY_CSV)
-                    logging.info(f"Cleaned up {CLUSTER_SUMMARY_CSV}")
+                    logging.info("Cleaned up %s", CLUSTER_SUMMARY_CSV)
                 
             except Exception as cleanup_error:
-                logging.error(f"Error cleaning up input files: {cleanup_error}")
+                logging.error("Error cleaning up input files: %s", cleanup_error)
             
-            # Verify the output files were written correctly
-            try:
-                with open(OUTPUT_RISK_ANALYSIS_CSV, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    logging.info(f"{OUTPUT_RISK_ANALYSIS_CSV} contains {len(lines)} lines (including header)")
-                
-                with open(FILTERED_TOKENS_WITH_ALL_RISKS_CSV, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    logging.info(f"{FILTERED_TOKENS_WITH_ALL_RISKS_CSV} contains {len(lines)} lines (including header)")
-            except Exception as verify_error:
-                logging.error(f"Error verifying output files: {verify_error}")
+            # Report what the writers emitted rather than reading both files back from disk
+            logging.info("%s contains %s rows (including header)", OUTPUT_RISK_ANALYSIS_CSV, rows_written + 1)
+            logging.info("%s contains %s rows (including header)", FILTERED_TOKENS_WITH_ALL_RISKS_CSV, rows_written + 1)
                 
         except Exception as e:
-            logging.error(f"Error in file operations: {e}", exc_info=True)
+            logging.error("Error in file operations: %s", e, exc_info=True)
     else:
         logging.info("No token data processed to write.")
         
@@ -356,4 +505,4 @@ if __name__ == "__main__":
     try:
         run_full_risk_analysis()
     except Exception as e:
-        logging.error(f"Critical error in risk_detector main execution: {e}", exc_info=True)
\ No newline at end of file
+        logging.error("Critical error in risk_detector main execution: %s", e, exc_info=True)
\ No newline at end of file
@@ -1,15 +1,17 @@
 import os
 import subprocess
 import sys
+import threading
 import time
 import signal
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import PatternMatchingEventHandler
 
 # --- Configuration ---
 CSV_FILENAME = "cluster_summaries.csv"
 TARGET_SCRIPT_FILENAME = "risk_detector.py"
 LOG_FILENAME = "risk_detector.log"
+DEBOUNCE_SECONDS = 0.3  # One pass per burst of modify events from a single append
 
 # Resolve paths relative to this script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -18,32 +20,70 @@ TARGET_SCRIPT_PATH = os.path.join(SCRIPT_DIR, TARGET_SCRIPT_FILENAME)
 LOG_FILE_PATH = os.path.join(SCRIPT_DIR, LOG_FILENAME)
 PID_FILE = os.path.join(SCRIPT_DIR, 'risk_detector.pid')
 
-class ClusterCSVChangeHandler(FileSystemEventHandler):
+class ClusterCSVChangeHandler(PatternMatchingEventHandler):
     def __init__(self):
-        self.last_line_count = self._current_line_count()
+        # Watchdog drops events for sibling files before they reach on_modified
+        super().__init__(patterns=[CSV_FILENAME], ignore_directories=True)
+        self._offset = 0
+        self._inode = None
+        self._poll_new_lines()  # Lines already in the file at startup do not trigger a run
         self.running_process: subprocess.Popen | None = None
         self.cooldown_seconds = 5
         self.last_launch_time = 0
+        self._debounce_timer: threading.Timer | None = None
+        self._timer_lock = threading.Lock()
+        self._process_lock = threading.Lock()
         self._cleanup_previous_process()
 
     def _terminate_pid(self, pid: int):
         try:
-            os.kill(pid, signal.SIGTERM)
-            start_time = time.time()
-            while time.time() - start_time < 5:
-                try:
-                    os.kill(pid, 0)
-                    time.sleep(0.5)
-                except OSError:
-                    break
+            import psutil
+        except ImportError:
+            psutil = None
+        try:
+            if psutil is None:
+                # Without psutil a foreign PID can only be polled for exit
+                os.kill(pid, signal.SIGTERM)
+                start_time = time.time()
+                while time.time() - start_time < 5:
+                    try:
+                        os.kill(pid, 0)
+                        time.sleep(0.5)
+                    except OSError:
+                        break
+                else:
+                    os.kill(pid, signal.SIGKILL)
+                    print(f"Watchdog: Force killed PID {pid} after timeout.")
             else:
-                os.kill(pid, signal.SIGKILL)
-                print(f"Watchdog: Force killed PID {pid} after timeout.")
+                proc = psutil.Process(pid)
+                proc.terminate()
+                try:
+                    proc.wait(timeout=5)
+                except psutil.TimeoutExpired:
+                    proc.kill()
+                    print(f"Watchdog: Force killed PID {pid} after timeout.")
             print(f"Watchdog: Terminated previous PID {pid}.")
         except ProcessLookupError:
             print(f"Watchdog: Previous PID {pid} not running.")
         except Exception as e:
-            print(f"Watchdog: Error terminating PID {pid}: {e}")
+            if psutil is not None and isinstance(e, psutil.NoSuchProcess):
+                print(f"Watchdog: Previous PID {pid} not running.")
+            else:
+                print(f"Watchdog: Error terminating PID {pid}: {e}")
+
+    def _terminate_process(self, process: subprocess.Popen):
+        # Our own child: wait() reaps it as soon as it exits instead of polling a PID that stays a zombie
+        try:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                print(f"Watchdog: Force killed PID {process.pid} after timeout.")
+            print(f"Watchdog: Terminated previous PID {process.pid}.")
+        except Exception as e:
+            print(f"Watchdog: Error terminating PID {process.pid}: {e}")
 
     def _cleanup_previous_process(self):
         if os.path.exists(PID_FILE):
@@ -59,30 +99,50 @@ class ClusterCSVChangeHandler(FileSystemEventHandler):
                 except FileNotFoundError:
                     pass
 
-    def _current_line_count(self) -> int:
-        if not os.path.exists(CSV_FILE_PATH):
+    def _poll_new_lines(self) -> int:
+        """Count lines appended since the last call by reading only the unread tail of the CSV."""
+        try:
+            st = os.stat(CSV_FILE_PATH)
+        except OSError:
+            self._offset, self._inode = 0, None
             return 0
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # Replaced or truncated (risk_detector deletes it after each run): start over from the top
+            self._offset, self._inode = 0, st.st_ino
         try:
-            with open(CSV_FILE_PATH, "r", encoding="utf-8-sig") as f:
-                return sum(1 for _ in f)
+            with open(CSV_FILE_PATH, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
         except Exception:
             return 0
+        self._offset += len(chunk)
+        return chunk.count(b"\n")
 
     def on_modified(self, event):
-        if event.is_directory:
-            return
-        if os.path.abspath(str(event.src_path)) != CSV_FILE_PATH:
+        with self._timer_lock:
+            if self._debounce_timer:
+                self._debounce_timer.cancel()
+            self._debounce_timer = threading.Timer(DEBOUNCE_SECONDS, self._process_change)
+            self._debounce_timer.daemon = True
+            self._debounce_timer.start()
+
+    def cancel_pending(self):
+        with self._timer_lock:
+            if self._debounce_timer:
+                self._debounce_timer.cancel()
+                self._debounce_timer = None
+
+    def _process_change(self):
+        with self._process_lock:
+            self._launch_if_new_lines()
+
+    def _launch_if_new_lines(self):
+        if self._poll_new_lines() <= 0:
             return
 
-        current_count = self._current_line_count()
-        if current_count <= self.last_line_count:
-            return
-
-        self.last_line_count = current_count
-
         if self.running_process and self.running_process.poll() is None:
             print(f"Watchdog: Terminating previous '{TARGET_SCRIPT_FILENAME}' (PID: {self.running_process.pid})...")
-            self._terminate_pid(self.running_process.pid)
+            self._terminate_process(self.running_process)
             self.running_process = None
             try:
                 os.remove(PID_FILE)
@@ -138,6 +198,7 @@ if __name__ == "__main__":
     finally:
         observer.stop()
         observer.join()
+        handler.cancel_pending()
         if handler.running_process and handler.running_process.poll() is None:
             print(f"Watchdog: Terminating running '{TARGET_SCRIPT_FILENAME}' (PID: {handler.running_process.pid})...")
             handler.running_process.terminate()
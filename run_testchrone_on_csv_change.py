@@ -1,10 +1,17 @@
+import hashlib
 import time
 import os
+import select
 import subprocess
 import sys
 import signal
+import threading
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import PatternMatchingEventHandler
+try:
+    import psutil  # Optional: kernel-notified waits and process-tree termination
+except ImportError:
+    psutil = None
 
 # --- Configuration ---
 # Name of the CSV file to monitor
@@ -28,56 +35,126 @@ TARGET_SCRIPT_PATH = os.path.join(SCRIPT_DIR, TARGET_SCRIPT_FILENAME)
 # Absolute path to the log file for the target script
 TARGET_SCRIPT_LOG_PATH = os.path.join(SCRIPT_DIR, TARGET_SCRIPT_LOG_FILENAME)
 PID_FILE = os.path.join(SCRIPT_DIR, 'test_chrome.pid')
+# Bytes at the end of the CSV hashed to tell a real content change from a same-content rewrite
+TAIL_HASH_BYTES = 4096
+# Quiet period after the last modify event before the CSV is checked, so one flush burst is one pass
+DEBOUNCE_SECONDS = 0.3
 
 
-class CSVChangeHandler(FileSystemEventHandler):
+def _rm_quiet(path: str):
+    """Remove a file if it is there; one unlink instead of an exists check plus remove."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_pidfile_atomic(pid: int):
+    """Write the PID file via a temp file and rename, so a reader never sees a partial number."""
+    tmp_path = PID_FILE + '.tmp'
+    with open(tmp_path, 'w') as pf:
+        pf.write(f"{pid}\n")
+    os.replace(tmp_path, PID_FILE)
+
+
+def _kill_tree(pid: int, sig, timeout: float, parent=None):
+    """Signal a process and all its descendants, wait for them together, and return the survivors."""
+    try:
+        if parent is None:
+            parent = psutil.Process(pid)
+        procs = [parent] + parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+    for p in procs:
+        try:
+            p.send_signal(sig)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    gone, alive = psutil.wait_procs(procs, timeout=timeout)
+    return alive
+
+
+def _install_signal_wakeup():
+    """Have every signal write a byte to a self-pipe and return its read end. Must run in the main thread."""
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    signal.set_wakeup_fd(write_fd)
+    return read_fd
+
+
+def _drain(fd: int):
+    try:
+        while os.read(fd, 512):
+            pass
+    except BlockingIOError:
+        pass
+
+
+class CSVChangeHandler(PatternMatchingEventHandler):
     def __init__(self):
-        self.last_mtime = 0
+        # Watchdog drops events for sibling files before they reach on_modified
+        super().__init__(patterns=[CSV_FILENAME], ignore_directories=True)
+        self.last_state = (0, 0)  # (st_mtime_ns, st_size) of the CSV at the last check
+        self.last_tail_hash = b''
         self.running_process = None  # Stores the subprocess.Popen object
+        self.running_pidfd = None  # Linux pidfd for running_process, immune to PID reuse
+        self.running_psproc = None  # psutil handle for running_process, reused by every termination step
+        self.log_fd = None  # Append-only descriptor for TARGET_SCRIPT_LOG_PATH, opened on first launch
         self.last_launch_time = 0 # To implement a simple cooldown for watchdog itself if needed
         self.cooldown_seconds = 5 # Cooldown for watchdog reacting to multiple quick changes
+        self._debounce_timer = None
+        self._timer_lock = threading.Lock()
+        self._launch_lock = threading.Lock()
+        self._stopping = False  # Set under _launch_lock by stop_running; no launches after that
         self._cleanup_previous_process()
 
-    def _terminate_pid(self, pid: int):
+    def _terminate_pid(self, pid: int, pidfd=None, psproc=None):
         try:
             # First try a gentle termination
             try:
-                os.kill(pid, signal.CTRL_BREAK_EVENT if os.name == 'nt' else signal.SIGTERM)
+                if pidfd is not None:
+                    signal.pidfd_send_signal(pidfd, signal.SIGTERM)
+                else:
+                    os.kill(pid, signal.CTRL_BREAK_EVENT if os.name == 'nt' else signal.SIGTERM)
                 print(f"Watchdog: Sent termination signal to PID {pid}...")
                 
                 # Wait for process to terminate
-                start_time = time.time()
-                while time.time() - start_time < 5:  # 5 second timeout
+                if pidfd is not None:
+                    # The pidfd turns readable the moment the process exits
+                    if select.select([pidfd], [], [], 5)[0]:
+                        print(f"Watchdog: PID {pid} terminated gracefully.")
+                        return
+                elif psutil is not None:
                     try:
-                        os.kill(pid, 0)  # Check if process exists
-                        time.sleep(0.2)
-                    except (ProcessLookupError, OSError):
+                        (psproc or psutil.Process(pid)).wait(timeout=5)
+                        print(f"Watchdog: PID {pid} terminated gracefully.")
+                        return
+                    except psutil.TimeoutExpired:
+                        pass  # Fall through to the force-kill path
+                    except psutil.NoSuchProcess:
                         print(f"Watchdog: PID {pid} terminated gracefully.")
                         return
+                else:
+                    start_time = time.time()
+                    while time.time() - start_time < 5:  # 5 second timeout
+                        try:
+                            os.kill(pid, 0)  # Check if process exists
+                            time.sleep(0.2)
+                        except (ProcessLookupError, OSError):
+                            print(f"Watchdog: PID {pid} terminated gracefully.")
+                            return
                 
                 # If we get here, process didn't terminate, force kill it
                 print(f"Watchdog: Process {pid} did not terminate gracefully, forcing...")
                 try:
-                    import psutil
-                    parent = psutil.Process(pid)
-                    children = parent.children(recursive=True)
-                    for child in children:
-                        try:
-                            child.terminate()
-                        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                            pass
-                    
-                    # Give children a moment to terminate
-                    gone, still_alive = psutil.wait_procs(children, timeout=3)
-                    for p in still_alive:
+                    survivors = _kill_tree(pid, signal.SIGTERM, timeout=3, parent=psproc)
+                    for p in survivors:
                         try:
                             p.kill()
                         except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                             pass
-                    
-                    # Now terminate the parent
-                    parent.terminate()
-                    parent.wait(3)
+                    psutil.wait_procs(survivors, timeout=2)
                     print(f"Watchdog: Force terminated process group for PID {pid}")
                 except Exception as e:
                     print(f"Watchdog: Error in process tree termination for {pid}: {e}")
@@ -96,119 +173,189 @@ class CSVChangeHandler(FileSystemEventHandler):
             print(f"Watchdog: Unexpected error in _terminate_pid for {pid}: {e}")
 
     def _cleanup_previous_process(self):
-        if os.path.exists(PID_FILE):
+        try:
+            with open(PID_FILE, 'r') as pf:
+                old_pid = int(pf.read().strip())
+            self._terminate_pid(old_pid)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Watchdog: Failed to read PID file: {e}")
+        _rm_quiet(PID_FILE)
+
+    def _notify_running(self):
+        """Cut test_chrome's idle wait short so it rescans the CSV now rather than on its next poll."""
+        if not hasattr(signal, 'SIGUSR1'):
+            print(f"Watchdog: '{CSV_FILENAME}' changed; running '{TARGET_SCRIPT_FILENAME}' will pick it up on its next poll.")
+            return
+        try:
+            if self.running_pidfd is not None:
+                signal.pidfd_send_signal(self.running_pidfd, signal.SIGUSR1)
+            else:
+                os.kill(self.running_process.pid, signal.SIGUSR1)
+            print(f"Watchdog: '{CSV_FILENAME}' changed; notified running '{TARGET_SCRIPT_FILENAME}' (PID: {self.running_process.pid}).")
+        except ProcessLookupError:
+            pass  # Exited in the meantime; the next change launches a fresh one
+        except Exception as e:
+            print(f"Watchdog: Error notifying PID {self.running_process.pid}: {e}")
+
+    def stop_running(self):
+        # Wait out a debounced launch already in progress and keep any later one from starting,
+        # otherwise it could spawn a child (in its own session) after we have stopped the last one
+        with self._launch_lock:
+            self._stopping = True
+            self._stop_running_locked()
+
+    def _stop_running_locked(self):
+        if self.running_process and self.running_process.poll() is None:
+            print(f"Watchdog: Terminating running '{TARGET_SCRIPT_FILENAME}' (PID: {self.running_process.pid})...")
+            pidfd = self.running_pidfd
+            psproc = self.running_psproc
+            self.running_pidfd = None
+            self.running_psproc = None
             try:
-                with open(PID_FILE, 'r') as pf:
-                    old_pid = int(pf.read().strip())
-                self._terminate_pid(old_pid)
+                # Store the PID before cleanup
+                old_pid = self.running_process.pid
+                # Clear the reference first to avoid race conditions
+                proc = self.running_process
+                self.running_process = None
+                # Now terminate the process
+                self._terminate_pid(old_pid, pidfd, psproc)
+                # Ensure the process object is cleaned up
+                try:
+                    proc.wait(timeout=1)
+                except (subprocess.TimeoutExpired, AttributeError):
+                    pass
             except Exception as e:
-                print(f"Watchdog: Failed to read PID file: {e}")
+                print(f"Watchdog: Error during process cleanup: {e}")
             finally:
+                if pidfd is not None:
+                    os.close(pidfd)
                 try:
-                    os.remove(PID_FILE)
-                except FileNotFoundError:
-                    pass
+                    _rm_quiet(PID_FILE)
+                except Exception as e:
+                    print(f"Watchdog: Error removing PID file: {e}")
 
     def on_modified(self, event):
-        if event.is_directory:
-            return
+        # Each flush of the CSV fires its own event; only act once the burst has settled
+        with self._timer_lock:
+            if self._debounce_timer:
+                self._debounce_timer.cancel()
+            self._debounce_timer = threading.Timer(DEBOUNCE_SECONDS, self.launch)
+            self._debounce_timer.daemon = True
+            self._debounce_timer.start()
+
+    def cancel_pending(self):
+        with self._timer_lock:
+            if self._debounce_timer:
+                self._debounce_timer.cancel()
+                self._debounce_timer = None
+
+    def launch(self):
+        with self._launch_lock:
+            if self._stopping:
+                return
+            self._launch_if_changed()
 
+    def _launch_if_changed(self):
         try:
-            event_abs_path = os.path.abspath(str(event.src_path))
-        except Exception:
+            st = os.stat(CSV_FILE_PATH)
+        except FileNotFoundError:
+            print(f"Watchdog: Monitored CSV file '{CSV_FILE_PATH}' seems to have been deleted.")
+            self.last_state = (0, 0) # Reset state
+            self.last_tail_hash = b'' # A recreated file counts as new even if its rows repeat
             return
 
-        if event_abs_path == CSV_FILE_PATH:
-            try:
-                current_mtime = os.path.getmtime(CSV_FILE_PATH)
-            except FileNotFoundError:
-                print(f"Watchdog: Monitored CSV file '{CSV_FILE_PATH}' seems to have been deleted.")
-                self.last_mtime = 0 # Reset mtime
-                return
+        current_state = (st.st_mtime_ns, st.st_size)
+        if current_state == self.last_state:
+            return # No actual content change likely
+        self.last_state = current_state
+        if st.st_size == 0:
+            return # Truncated ahead of a rewrite; wait for the rows to land
 
-            if current_mtime == self.last_mtime:
-                # print(f"Watchdog: '{CSV_FILENAME}' modified event, but mtime is unchanged ({current_mtime}). Skipping.")
-                return # No actual content change likely
-            
-            self.last_mtime = current_mtime
+        try:
+            with open(CSV_FILE_PATH, 'rb') as f:
+                f.seek(max(0, st.st_size - TAIL_HASH_BYTES))
+                tail_hash = hashlib.blake2b(f.read(), digest_size=16).digest()
+        except OSError:
+            tail_hash = b''
+        if tail_hash and tail_hash == self.last_tail_hash:
+            return # Rewritten with the same trailing rows; nothing new for test_chrome
+        self.last_tail_hash = tail_hash
 
-            # Simple cooldown for watchdog itself to avoid rapid-fire launches from editor saves etc.
-            current_time = time.time()
-            if current_time - self.last_launch_time < self.cooldown_seconds:
-                print(f"Watchdog: '{CSV_FILENAME}' changed, but still in cooldown. Skipping launch.")
-                return
+        # Simple cooldown for watchdog itself to avoid rapid-fire launches from editor saves etc.
+        current_time = time.time()
+        if current_time - self.last_launch_time < self.cooldown_seconds:
+            print(f"Watchdog: '{CSV_FILENAME}' changed, but still in cooldown. Skipping launch.")
+            return
 
-            if not os.path.exists(TARGET_SCRIPT_PATH):
-                print(f"Watchdog: ERROR - Target script '{TARGET_SCRIPT_PATH}' not found. Cannot launch.")
-                return
+        if self.running_process and self.running_process.poll() is None:
+            # test_chrome polls the CSV itself; keep the warm process (and its Chrome session) and wake it up
+            self._notify_running()
+            return
 
-            if self.running_process and self.running_process.poll() is None:
-                print(f"Watchdog: Terminating previous '{TARGET_SCRIPT_FILENAME}' (PID: {self.running_process.pid})...")
-                try:
-                    # Store the PID before cleanup
-                    old_pid = self.running_process.pid
-                    # Clear the reference first to avoid race conditions
-                    proc = self.running_process
-                    self.running_process = None
-                    # Now terminate the process
-                    self._terminate_pid(old_pid)
-                    # Ensure the process object is cleaned up
-                    try:
-                        proc.wait(timeout=1)
-                    except (subprocess.TimeoutExpired, AttributeError):
-                        pass
-                except Exception as e:
-                    print(f"Watchdog: Error during process cleanup: {e}")
-                finally:
-                    try:
-                        if os.path.exists(PID_FILE):
-                            os.remove(PID_FILE)
-                    except Exception as e:
-                        print(f"Watchdog: Error removing PID file: {e}")
+        if not os.path.exists(TARGET_SCRIPT_PATH):
+            print(f"Watchdog: ERROR - Target script '{TARGET_SCRIPT_PATH}' not found. Cannot launch.")
+            return
 
-            print(f"Watchdog: '{CSV_FILENAME}' content changed (mtime: {current_mtime}). Launching '{TARGET_SCRIPT_FILENAME}'...")
-            try:
-                with open(TARGET_SCRIPT_LOG_PATH, "a", encoding="utf-8") as logf:
-                    logf.write(f"\n--- Watchdog launching {TARGET_SCRIPT_FILENAME} at {time.asctime()} due to {CSV_FILENAME} change ---\n")
-                    
-                    # Create a new process group for the subprocess to isolate signals
-                    creation_flags = 0
-                    if os.name == 'nt':
-                        creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP
-                    else:
-                        # On Unix-like systems, we'll use preexec_fn to create a new process group
-                        def preexec():
-                            import os
-                            os.setpgrp()
-                    
-                    self.running_process = subprocess.Popen(
-                        [sys.executable, TARGET_SCRIPT_PATH],
-                        stdout=logf,
-                        stderr=logf,
-                        text=True,
-                        cwd=SCRIPT_DIR,
-                        creationflags=creation_flags if os.name == 'nt' else 0,
-                        preexec_fn=preexec if os.name != 'nt' else None
-                    )
-                    with open(PID_FILE, 'w') as pf:
-                        pf.write(str(self.running_process.pid))
-                    self.last_launch_time = current_time # Update last launch time
-                    print(f"Watchdog: Successfully launched '{TARGET_SCRIPT_FILENAME}' with PID {self.running_process.pid}. "
-                          f"Output logged to '{TARGET_SCRIPT_LOG_PATH}'.")
-            except Exception as e:
-                print(f"Watchdog: ERROR - Failed to launch '{TARGET_SCRIPT_FILENAME}': {e}")
+        print(f"Watchdog: '{CSV_FILENAME}' content changed (mtime: {st.st_mtime}). Launching '{TARGET_SCRIPT_FILENAME}'...")
+        try:
+            if self.log_fd is None:
+                # O_APPEND makes every write land at the end, so our banners and the child's output never overlap
+                self.log_fd = os.open(TARGET_SCRIPT_LOG_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self.log_fd, f"\n--- Watchdog launching {TARGET_SCRIPT_FILENAME} at {time.asctime()} due to {CSV_FILENAME} change ---\n".encode("utf-8"))
+            
+            # Create a new process group for the subprocess to isolate signals
+            creation_flags = 0
+            if os.name == 'nt':
+                creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP
+            
+            self.running_process = subprocess.Popen(
+                [sys.executable, TARGET_SCRIPT_PATH],
+                stdout=self.log_fd,
+                stderr=self.log_fd,
+                cwd=SCRIPT_DIR,
+                creationflags=creation_flags,
+                # setsid() in C between fork and exec; unlike preexec_fn, no Python runs in the forked child
+                start_new_session=(os.name != 'nt')
+            )
+            if self.running_pidfd is not None:
+                os.close(self.running_pidfd)  # Left over from a run that exited on its own
+                self.running_pidfd = None
+            if hasattr(os, 'pidfd_open') and hasattr(signal, 'pidfd_send_signal'):
+                try:
+                    self.running_pidfd = os.pidfd_open(self.running_process.pid)
+                except OSError:
+                    self.running_pidfd = None  # Kernel older than 5.3: fall back to the PID
+            self.running_psproc = None
+            if psutil is not None:
+                try:
+                    self.running_psproc = psutil.Process(self.running_process.pid)
+                except psutil.Error:
+                    pass  # Already gone; termination falls back to the PID
+            _write_pidfile_atomic(self.running_process.pid)
+            self.last_launch_time = current_time # Update last launch time
+            print(f"Watchdog: Successfully launched '{TARGET_SCRIPT_FILENAME}' with PID {self.running_process.pid}. "
+                  f"Output logged to '{TARGET_SCRIPT_LOG_PATH}'.")
+        except Exception as e:
+            print(f"Watchdog: ERROR - Failed to launch '{TARGET_SCRIPT_FILENAME}': {e}")
 
 
 if __name__ == "__main__":
     # Configure signal handlers early to prevent KeyboardInterrupt during initialization
-    import signal
+    # The handler only flips a flag: anything that takes a lock (Event.set, print) can deadlock
+    # against the main thread it interrupted
+    stop_requested = False
     
     def signal_handler(sig, frame):
-        print("\nWatchdog: Received shutdown signal. Cleaning up...")
-        sys.exit(0)
+        global stop_requested
+        stop_requested = True
     
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    # Signals also land on this pipe, so the main loop's select can never miss one
+    # (Windows only accepts a socket here; it keeps the sleep loop below)
+    wakeup_fd = _install_signal_wakeup() if os.name != 'nt' else None
     
     if not os.path.exists(CSV_FILE_PATH):
         print(f"Watchdog: WARNING - Monitored CSV file '{CSV_FILE_PATH}' does not exist. "
@@ -234,8 +381,13 @@ if __name__ == "__main__":
     observer.start()
 
     try:
-        while True:
-            time.sleep(1)
+        while not stop_requested:
+            if wakeup_fd is None:
+                time.sleep(1)  # Windows runs the Ctrl+C handler between sleeps
+            else:
+                select.select([wakeup_fd], [], [])
+                _drain(wakeup_fd)
+        print("\nWatchdog: Received shutdown signal. Cleaning up...")
     except KeyboardInterrupt:
         print("\nWatchdog: KeyboardInterrupt received. Stopping observer...")
     except Exception as e:
@@ -245,26 +397,13 @@ if __name__ == "__main__":
         print("Watchdog: Observer stopped.")
         observer.join()
         print("Watchdog: Observer joined.")
+        event_handler.cancel_pending()
 
-        if event_handler.running_process and event_handler.running_process.poll() is None:
-            print(f"Watchdog: Terminating running target script '{TARGET_SCRIPT_FILENAME}' (PID: {event_handler.running_process.pid})...")
-            event_handler.running_process.terminate()
-            try:
-                event_handler.running_process.wait(timeout=5)
-                print(f"Watchdog: Target script PID {event_handler.running_process.pid} terminated gracefully.")
-            except subprocess.TimeoutExpired:
-                print(f"Watchdog: Target script PID {event_handler.running_process.pid} did not terminate gracefully. Sending SIGKILL...")
-                event_handler.running_process.kill()
-                try:
-                    event_handler.running_process.wait(timeout=2)
-                    print(f"Watchdog: Target script PID {event_handler.running_process.pid} killed.")
-                except Exception as e_kill:
-                    print(f"Watchdog: Error during SIGKILL for PID {event_handler.running_process.pid}: {e_kill}")
-            except Exception as e_term:
-                 print(f"Watchdog: Error during termination for PID {event_handler.running_process.pid}: {e_term}")
-        if os.path.exists(PID_FILE):
-            try:
-                os.remove(PID_FILE)
-            except Exception:
-                pass
+        event_handler.stop_running()
+        if event_handler.log_fd is not None:
+            os.close(event_handler.log_fd)
+        try:
+            _rm_quiet(PID_FILE)
+        except Exception:
+            pass
         print("Watchdog: Exiting.")
\ No newline at end of file
@@ -2,15 +2,14 @@
 
 import logging
 import os
-import subprocess
 import sys
 import signal # For sending signals like SIGINT, SIGSTOP, SIGCONT
 import asyncio
 import json
-from decimal import Decimal
+import secrets
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext, CallbackQueryHandler, JobQueue
+from telegram.ext import Application, CommandHandler, filters, CallbackContext, CallbackQueryHandler, JobQueue
 import pytz
 import time
 import datetime
@@ -32,8 +31,25 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SNIPERX_SCRIPT_PATH = os.path.join(SCRIPT_DIR, SNIPERX_SCRIPT_NAME)
 WALLET_MANAGER_PATH = os.path.join(SCRIPT_DIR, WALLET_MANAGER_SCRIPT)
 
+# Update transport: "polling" (default) or "webhook". Webhook mode needs a public HTTPS URL
+# that forwards to PORT and the python-telegram-bot[webhooks] extra.
+TELEGRAM_TRANSPORT = os.getenv("TELEGRAM_TRANSPORT", "polling").strip().lower()
+PUBLIC_URL = (os.getenv("TELEGRAM_WEBHOOK_URL") or "").rstrip("/")
+PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+# Random per run; used as both the webhook path and Telegram's secret token header
+SECRET_PATH = secrets.token_urlsafe(20)
+# Only the update types the bot handles; Telegram does not send us the rest
+ALLOWED_UPDATES = ["callback_query", "message"]
+
 # --- Logging ---
+_logging_configured = False
+
 def setup_logging():
+    global _logging_configured
+    # Configure once; a second call would otherwise open another timestamped log file
+    if _logging_configured:
+        return logging.getLogger(__name__)
+
     # Create logs directory if it doesn't exist
     logs_dir = os.path.join(SCRIPT_DIR, 'logs')
     os.makedirs(logs_dir, exist_ok=True)
@@ -65,6 +81,7 @@ def setup_logging():
     # Add handlers to the logger
     logger.addHandler(console_handler)
     logger.addHandler(file_handler)
+    _logging_configured = True
     
     return logging.getLogger(__name__)
 
@@ -73,9 +90,66 @@ logger = setup_logging()
 
 # --- Global state for SniperX process ---
 global sniperx_process, wallet_manager_process, current_balance
-sniperx_process: subprocess.Popen | None = None
-wallet_manager_process: subprocess.Popen | None = None
-current_balance = {"sol": Decimal("0"), "usd": Decimal("0")}
+sniperx_process: asyncio.subprocess.Process | None = None
+wallet_manager_process: asyncio.subprocess.Process | None = None
+current_balance = {"sol": 0.0, "usd": 0.0}
+
+# Serializes start/stop/restart of the child processes. /start and /stop run on the dispatcher
+# while button actions run on per-chat workers, so they can otherwise interleave at an await.
+_PROCESS_LOCK = asyncio.Lock()
+
+# --- Child process helpers ---
+def _send_stop_signal(proc: asyncio.subprocess.Process) -> None:
+    """Ask a child to shut down: SIGINT (Ctrl+C equivalent) on POSIX, terminate on Windows."""
+    try:
+        if os.name == 'nt':
+            proc.terminate()
+        else:
+            proc.send_signal(signal.SIGINT)
+    except ProcessLookupError:
+        pass  # Already exited; wait() will collect the return code
+
+async def _kill_process(proc: asyncio.subprocess.Process) -> None:
+    """Force kill a child and reap it."""
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+async def _stop_process(proc: asyncio.subprocess.Process, timeout: float) -> bool:
+    """Signal a child to stop and wait for it without blocking the event loop.
+
+    Returns True if it exited on its own, False if it had to be killed.
+    """
+    _send_stop_signal(proc)
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        await _kill_process(proc)
+        return False
+
+# --- Inline keyboards (immutable, so built once) ---
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🚀 Start SniperX", callback_data='start_sniperx'),
+    ],
+    [
+        InlineKeyboardButton("🛑 Stop SniperX", callback_data='stop_sniperx'),
+        InlineKeyboardButton("📊 Status", callback_data='status_sniperx'),
+    ],
+    [
+        InlineKeyboardButton("💰 Balance", callback_data='show_balance'),
+    ]
+])
+BALANCE_MARKUP = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🔄 Refresh", callback_data='show_balance'),
+    InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
+]])
+BACK_MARKUP = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
+]])
 
 # --- Helper to check if user is authorized ---
 def is_authorized(update: Update) -> bool:
@@ -84,6 +158,17 @@ def is_authorized(update: Update) -> bool:
         return True # Or False for security
     return update.effective_chat is not None and str(update.effective_chat.id) == str(TELEGRAM_CHAT_ID)
 
+def _build_chat_filter():
+    """filters.Chat for TELEGRAM_CHAT_ID, or None if it is unset or not a numeric chat id."""
+    if not TELEGRAM_CHAT_ID:
+        return None
+    try:
+        return filters.Chat(chat_id=int(TELEGRAM_CHAT_ID.strip().strip('"\'')))
+    except ValueError:
+        logger.error(f"TELEGRAM_CHAT_ID {TELEGRAM_CHAT_ID!r} is not a numeric chat id; "
+                     "commands are not filtered by chat and rely on the authorization check.")
+        return None
+
 # --- Command Handlers ---
 async def start_command(update: Update, context: CallbackContext) -> None:
     if not is_authorized(update):
@@ -92,50 +177,51 @@ async def start_command(update: Update, context: CallbackContext) -> None:
         return
 
     global sniperx_process, wallet_manager_process
-    if sniperx_process and sniperx_process.poll() is None:
-        if update.message:
-            await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} is already running (PID: {sniperx_process.pid}).")
-    else:
-        try:
-            if not os.path.exists(SNIPERX_SCRIPT_PATH):
+    async with _PROCESS_LOCK:
+        if sniperx_process and sniperx_process.returncode is None:
+            if update.message:
+                await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} is already running (PID: {sniperx_process.pid}).")
+        else:
+            try:
+                if not os.path.exists(SNIPERX_SCRIPT_PATH):
+                    if update.message:
+                        await update.message.reply_text(f"Error: {SNIPERX_SCRIPT_NAME} not found at {SNIPERX_SCRIPT_PATH}.")
+                    return
+
+                # Start wallet manager first
                 if update.message:
-                    await update.message.reply_text(f"Error: {SNIPERX_SCRIPT_NAME} not found at {SNIPERX_SCRIPT_PATH}.")
-                return
+                    await update.message.reply_text("Starting wallet manager...")
+
+                # Start the wallet manager without piping stdout/stderr to avoid
+                # blocking if the buffers fill up. Output will be inherited by the
+                # parent process and written directly to the console or logs.
+                wallet_manager_process = await asyncio.create_subprocess_exec(
+                    sys.executable, WALLET_MANAGER_PATH,
+                    cwd=SCRIPT_DIR
+                )
+
+                # Wait a moment for wallet manager to initialize
+                await asyncio.sleep(2)
+
+                # Check if the wallet manager exited immediately
+                if wallet_manager_process.returncode is not None:
+                    if update.message:
+                        await update.message.reply_text("Failed to start wallet manager.")
+                    return
+
+                # Start SniperX
+                sniperx_process = await asyncio.create_subprocess_exec(
+                    sys.executable, SNIPERX_SCRIPT_PATH,
+                    cwd=SCRIPT_DIR
+                )
 
-            # Start wallet manager first
-            if update.message:
-                await update.message.reply_text("Starting wallet manager...")
-            
-            # Start the wallet manager without piping stdout/stderr to avoid
-            # blocking if the buffers fill up. Output will be inherited by the
-            # parent process and written directly to the console or logs.
-            wallet_manager_process = subprocess.Popen(
-                [sys.executable, WALLET_MANAGER_PATH],
-                cwd=SCRIPT_DIR
-            )
-            
-            # Wait a moment for wallet manager to initialize
-            await asyncio.sleep(2)
-            
-            # Check if the wallet manager exited immediately
-            if wallet_manager_process.poll() is not None:
                 if update.message:
-                    await update.message.reply_text("Failed to start wallet manager.")
-                return
-            
-            # Start SniperX
-            sniperx_process = subprocess.Popen(
-                [sys.executable, SNIPERX_SCRIPT_PATH],
-                cwd=SCRIPT_DIR
-            )
-            
-            if update.message:
-                await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} started with PID {sniperx_process.pid}.")
-            logger.info(f"SniperX V2.py started with PID {sniperx_process.pid} by user {update.effective_user.username if update.effective_user else 'unknown'}")
-        except Exception as e:
-            if update.message:
-                await update.message.reply_text(f"Failed to start {SNIPERX_SCRIPT_NAME}: {e}")
-            logger.error(f"Failed to start SniperX: {e}")
+                    await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} started with PID {sniperx_process.pid}.")
+                logger.info(f"SniperX V2.py started with PID {sniperx_process.pid} by user {update.effective_user.username if update.effective_user else 'unknown'}")
+            except Exception as e:
+                if update.message:
+                    await update.message.reply_text(f"Failed to start {SNIPERX_SCRIPT_NAME}: {e}")
+                logger.error(f"Failed to start SniperX: {e}")
 
 async def stop_command(update: Update, context: CallbackContext) -> None:
     if not is_authorized(update):
@@ -144,46 +230,35 @@ async def stop_command(update: Update, context: CallbackContext) -> None:
         return
 
     global sniperx_process, wallet_manager_process
-    if sniperx_process and sniperx_process.poll() is None:
-        try:
-            pid_to_stop = sniperx_process.pid
-            if os.name == 'nt': # Windows
-                 # subprocess.call(['taskkill', '/F', '/T', '/PID', str(sniperx_process.pid)]) # More forceful
-                sniperx_process.terminate() # Sends SIGTERM equivalent
-            else: # Linux/macOS
-                os.kill(sniperx_process.pid, signal.SIGINT) # Send Ctrl+C equivalent for graceful shutdown
-            
-            sniperx_process.wait(timeout=10) # Wait for process to terminate
-            if update.message:
-                await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} (PID: {pid_to_stop}) signaled to stop gracefully.")
-            logger.info(f"SniperX V2.py (PID: {pid_to_stop}) stopped by user {update.effective_user.username if update.effective_user else 'unknown'}")
-        except subprocess.TimeoutExpired:
-            if update.message:
-                await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} (PID: {pid_to_stop}) did not stop gracefully. Forcing kill.")
-            sniperx_process.kill()
-            sniperx_process.wait()
-            logger.warning(f"SniperX V2.py (PID: {pid_to_stop}) force killed by user {update.effective_user.username if update.effective_user else 'unknown'}")
-        except Exception as e:
-            if update.message:
-                await update.message.reply_text(f"Error stopping {SNIPERX_SCRIPT_NAME}: {e}")
-            logger.error(f"Error stopping SniperX: {e}")
-        finally:
-            sniperx_process = None
+    async with _PROCESS_LOCK:
+        if sniperx_process and sniperx_process.returncode is None:
+            try:
+                pid_to_stop = sniperx_process.pid
+                if await _stop_process(sniperx_process, timeout=10):
+                    if update.message:
+                        await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} (PID: {pid_to_stop}) signaled to stop gracefully.")
+                    logger.info(f"SniperX V2.py (PID: {pid_to_stop}) stopped by user {update.effective_user.username if update.effective_user else 'unknown'}")
+                else:
+                    if update.message:
+                        await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} (PID: {pid_to_stop}) did not stop gracefully. Forcing kill.")
+                    logger.warning(f"SniperX V2.py (PID: {pid_to_stop}) force killed by user {update.effective_user.username if update.effective_user else 'unknown'}")
+            except Exception as e:
+                if update.message:
+                    await update.message.reply_text(f"Error stopping {SNIPERX_SCRIPT_NAME}: {e}")
+                logger.error(f"Error stopping SniperX: {e}")
+            finally:
+                sniperx_process = None
 
-    # Stop wallet manager if running
-    if wallet_manager_process and wallet_manager_process.poll() is None:
-        try:
-            if os.name == 'nt':
-                wallet_manager_process.terminate()
-            else:
-                os.kill(wallet_manager_process.pid, signal.SIGINT)
-            wallet_manager_process.wait(timeout=5)
-        except Exception as e:
-            logger.error(f"Error stopping wallet manager: {e}")
-            if wallet_manager_process.poll() is None:
-                wallet_manager_process.kill()
-        finally:
-            wallet_manager_process = None
+        # Stop wallet manager if running
+        if wallet_manager_process and wallet_manager_process.returncode is None:
+            try:
+                await _stop_process(wallet_manager_process, timeout=5)
+            except Exception as e:
+                logger.error(f"Error stopping wallet manager: {e}")
+                if wallet_manager_process.returncode is None:
+                    await _kill_process(wallet_manager_process)
+            finally:
+                wallet_manager_process = None
 
 async def status_command(update: Update, context: CallbackContext) -> None:
     if not is_authorized(update):
@@ -191,8 +266,8 @@ async def status_command(update: Update, context: CallbackContext) -> None:
             await update.message.reply_text("You are not authorized to use this bot.")
         return
     global sniperx_process
-    if sniperx_process and sniperx_process.poll() is None:
-        status = "paused" if sniperx_process.poll() is None else "running"
+    if sniperx_process and sniperx_process.returncode is None:
+        status = "paused" if sniperx_process.returncode is None else "running"
         if update.message:
             await update.message.reply_text(f"{SNIPERX_SCRIPT_NAME} is currently {status} (PID: {sniperx_process.pid}).")
     else:
@@ -206,20 +281,8 @@ async def show_menu(update: Update, context: CallbackContext) -> None:
             await update.message.reply_text("You are not authorized to use this bot.")
         return
 
-    keyboard = [
-        [
-            InlineKeyboardButton("🚀 Start SniperX", callback_data='start_sniperx'),
-        ],
-        [
-            InlineKeyboardButton("🛑 Stop SniperX", callback_data='stop_sniperx'),
-            InlineKeyboardButton("📊 Status", callback_data='status_sniperx'),
-        ],
-        [
-            InlineKeyboardButton("💰 Balance", callback_data='show_balance'),
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
+    reply_markup = MAIN_MENU_MARKUP
+
     try:
         if update.callback_query:
             await update.callback_query.edit_message_text(
@@ -239,69 +302,111 @@ async def show_menu(update: Update, context: CallbackContext) -> None:
                 reply_markup=reply_markup
             )
 
+# Parsed wallet_balance.json, keyed by the file's mtime so unchanged files are not re-read
+_BALANCE_CACHE = {"mtime": 0, "data": None}
+
+def _empty_balance():
+    return {"sol": 0.0, "usd": 0.0, "timestamp": 0}
+
+def _load_wallet_balance_file(balance_file_path):
+    """Read and parse the balance file. Returns None if its contents are unusable."""
+    with open(balance_file_path, "r") as f:
+        data = json.load(f)
+
+    # Check if required fields exist
+    if not all(key in data for key in ["sol", "usd", "timestamp"]):
+        logger.error(f"Missing required fields in wallet balance data: {data}")
+        return None
+
+    # Parse the balance values
+    try:
+        return {
+            "sol": float(data["sol"]),
+            "usd": float(data["usd"]),
+            "timestamp": float(data["timestamp"])
+        }
+    except (ValueError, TypeError) as ve:
+        logger.error(f"Error parsing balance values: {ve}, data: {data}")
+        return None
+
 async def read_wallet_balance():
     """Read the current wallet balance from the JSON file."""
+    balance_file_path = os.path.join(SCRIPT_DIR, "wallet_balance.json")
     try:
-        balance_file_path = os.path.join(SCRIPT_DIR, "wallet_balance.json")
-        logger.info(f"Reading wallet balance from: {balance_file_path}")
-        
-        if not os.path.exists(balance_file_path):
+        try:
+            mtime = os.stat(balance_file_path).st_mtime_ns
+        except FileNotFoundError:
             logger.warning(f"Wallet balance file not found: {balance_file_path}")
-            return {"sol": Decimal("0"), "usd": Decimal("0"), "timestamp": 0}
-            
-        with open(balance_file_path, "r") as f:
-            try:
-                data = json.load(f)
-                logger.debug(f"Raw wallet balance data: {data}")
-                
-                # Check if required fields exist
-                if not all(key in data for key in ["sol", "usd", "timestamp"]):
-                    logger.error(f"Missing required fields in wallet balance data: {data}")
-                    return {"sol": Decimal("0"), "usd": Decimal("0"), "timestamp": 0}
-                
-                # Check if the data is recent (within last 5 minutes)
-                timestamp = float(data.get("timestamp", 0))
-                current_time = time.time()
-                time_diff = current_time - timestamp
-                
-                if time_diff > 300:  # 5 minutes in seconds
-                    logger.warning(f"Balance data is too old ({(time_diff/60):.1f} minutes old)")
-                    return {"sol": Decimal("0"), "usd": Decimal("0"), "timestamp": 0}
-                
-                # Parse the balance values
-                try:
-                    sol_balance = Decimal(str(data["sol"]))
-                    usd_balance = Decimal(str(data["usd"]))
-                    
-                    logger.info(f"Successfully read balance - SOL: {sol_balance}, USD: {usd_balance}, Age: {(time_diff/60):.1f} minutes")
-                    
-                    return {
-                        "sol": sol_balance,
-                        "usd": usd_balance,
-                        "timestamp": timestamp
-                    }
-                except (ValueError, TypeError) as ve:
-                    logger.error(f"Error parsing balance values: {ve}, data: {data}")
-                    return {"sol": Decimal("0"), "usd": Decimal("0"), "timestamp": 0}
-                    
-            except json.JSONDecodeError as je:
-                logger.error(f"Error decoding wallet balance JSON: {je}")
-                return {"sol": Decimal("0"), "usd": Decimal("0"), "timestamp": 0}
-                
+            return _empty_balance()
+
+        if mtime != _BALANCE_CACHE["mtime"]:
+            # Parse off the event loop; only cache once the file parsed cleanly, so a half-written
+            # file is read again on the next press instead of being pinned until its mtime changes
+            data = await asyncio.to_thread(_load_wallet_balance_file, balance_file_path)
+            if data is None:
+                return _empty_balance()
+            _BALANCE_CACHE["mtime"] = mtime
+            _BALANCE_CACHE["data"] = data
+
+        balance = _BALANCE_CACHE["data"]
+
+        # Check if the data is recent (within last 5 minutes)
+        time_diff = time.time() - balance["timestamp"]
+        if time_diff > 300:  # 5 minutes in seconds
+            logger.warning(f"Balance data is too old ({(time_diff/60):.1f} minutes old)")
+            return _empty_balance()
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Wallet balance - SOL: {balance['sol']}, USD: {balance['usd']}, Age: {(time_diff/60):.1f} minutes")
+        return balance
+
+    except json.JSONDecodeError as je:
+        logger.error(f"Error decoding wallet balance JSON: {je}")
     except Exception as e:
         logger.exception(f"Unexpected error in read_wallet_balance: {e}")
-    
-    return {"sol": Decimal("0"), "usd": Decimal("0"), "timestamp": 0}
+
+    return _empty_balance()
+
+# --- Per-chat button action queues ---
+# Button presses are acknowledged immediately and handled by one worker task per chat, so a slow
+# start/stop never holds up the update dispatcher while presses within a chat stay in order.
+_CHAT_QUEUES: dict[int, asyncio.Queue] = {}
+_CHAT_WORKERS: dict[int, asyncio.Task] = {}
+# Actions that spawn or stop processes; the message shows a placeholder while they run
+_SLOW_ACTIONS = {'start_sniperx': "Starting SniperX…", 'stop_sniperx': "Stopping SniperX…"}
+
+async def _chat_worker(chat_id: int, queue: asyncio.Queue) -> None:
+    while True:
+        update, context, action = await queue.get()
+        try:
+            await _handle_button_action(update, context, action)
+        except Exception:
+            logger.exception(f"Unhandled error processing {action} for chat {chat_id}")
+        finally:
+            queue.task_done()
+
+def _enqueue_button_action(chat_id: int, update: Update, context: CallbackContext, action: str) -> None:
+    queue = _CHAT_QUEUES.setdefault(chat_id, asyncio.Queue())
+    worker = _CHAT_WORKERS.get(chat_id)
+    if worker is None or worker.done():
+        _CHAT_WORKERS[chat_id] = asyncio.create_task(_chat_worker(chat_id, queue))
+    queue.put_nowait((update, context, action))
+
+async def _cancel_chat_workers() -> None:
+    workers = list(_CHAT_WORKERS.values())
+    _CHAT_WORKERS.clear()
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
 
 async def button_callback(update: Update, context: CallbackContext) -> None:
-    global wallet_manager_process  # Move global declaration here
+    logger.info(f"Button callback received: {update}")
+    query = update.callback_query
+    if not query:
+        logger.warning("No query in update")
+        return
+
     try:
-        logger.info(f"Button callback received: {update}")
-        query = update.callback_query
-        if not query:
-            logger.warning("No query in update")
-            return
-            
         await query.answer()
 
         if not is_authorized(update):
@@ -314,7 +419,23 @@ async def button_callback(update: Update, context: CallbackContext) -> None:
         if not action:
             logger.warning("No action in query data")
             return
-            
+    except Exception as e:
+        logger.error(f"Error acknowledging button callback: {e}")
+        return
+
+    if action in _SLOW_ACTIONS:
+        try:
+            await query.edit_message_text(text=_SLOW_ACTIONS[action])
+        except Exception as e:
+            logger.error(f"Error showing placeholder for {action}: {e}")
+
+    chat_id = update.effective_chat.id if update.effective_chat else 0
+    _enqueue_button_action(chat_id, update, context, action)
+
+async def _handle_button_action(update: Update, context: CallbackContext, action: str) -> None:
+    global sniperx_process, wallet_manager_process
+    query = update.callback_query
+    try:
         logger.info(f"Processing action: {action}")
         
         if action == 'start_sniperx':
@@ -342,99 +463,93 @@ async def button_callback(update: Update, context: CallbackContext) -> None:
                     await stop_command(pseudo_update, context)
                 await show_menu(update, context)
         elif action == 'status_sniperx':
-            global sniperx_process
-            if sniperx_process and sniperx_process.poll() is None:
+            if sniperx_process and sniperx_process.returncode is None:
                 status_text = "running"
                 await query.edit_message_text(
                     text=f"{SNIPERX_SCRIPT_NAME} is currently {status_text} (PID: {sniperx_process.pid}).",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
-                    ]])
+                    reply_markup=BACK_MARKUP
                 )
             else:
                 await query.edit_message_text(
                     text=f"{SNIPERX_SCRIPT_NAME} is not running.",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
-                    ]])
+                    reply_markup=BACK_MARKUP
                 )
         elif action == 'show_balance':
-            try:
-                logger.info("Processing show_balance action")
-                # Update balance from file
-                current_balance = await read_wallet_balance()
-                logger.info(f"Current balance after read: {current_balance}")
-                
-                # Check if SniperX is running
-                if not sniperx_process or sniperx_process.poll() is not None:
-                    balance_text = "SniperX is not running. Please start SniperX first."
-                    logger.warning(balance_text)
-                # Check if wallet manager is running
-                elif not wallet_manager_process or wallet_manager_process.poll() is not None:
-                    logger.info("Wallet manager not running, attempting to start it")
-                    # Try to restart wallet manager if SniperX is running but wallet manager isn't
-                    try:
-                        logger.info(f"Starting wallet manager from: {WALLET_MANAGER_PATH}")
-                        wallet_manager_process = subprocess.Popen(
-                            [sys.executable, WALLET_MANAGER_PATH],
-                            cwd=SCRIPT_DIR,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE
-                        )
-                        logger.info(f"Wallet manager started with PID: {wallet_manager_process.pid}")
-                        
-                        # Give it a moment to start
-                        await asyncio.sleep(2)
-                        
-                        if wallet_manager_process.poll() is not None:
-                            error_output = wallet_manager_process.stderr.read().decode() if wallet_manager_process.stderr else 'No error output'
-                            logger.error(f"Wallet manager failed to start. Exit code: {wallet_manager_process.returncode}, Error: {error_output}")
-                            balance_text = "Failed to start wallet manager. Please check logs and restart SniperX."
-                        else:
-                            logger.info("Wallet manager started successfully, reading balance...")
-                            current_balance = await read_wallet_balance()
-                            logger.info(f"Balance after wallet manager start: {current_balance}")
-                            
-                            if current_balance["sol"] == Decimal("0"):
-                                balance_text = "Wallet manager is starting up. Please wait a moment and try again."
-                                logger.info(balance_text)
+            # Holds the process lock: this branch may restart the wallet manager
+            async with _PROCESS_LOCK:
+                try:
+                    logger.info("Processing show_balance action")
+                    # Update balance from file
+                    current_balance = await read_wallet_balance()
+                    logger.info(f"Current balance after read: {current_balance}")
+
+                    # Check if SniperX is running
+                    if not sniperx_process or sniperx_process.returncode is not None:
+                        balance_text = "SniperX is not running. Please start SniperX first."
+                        logger.warning(balance_text)
+                    # Check if wallet manager is running
+                    elif not wallet_manager_process or wallet_manager_process.returncode is not None:
+                        logger.info("Wallet manager not running, attempting to start it")
+                        # Try to restart wallet manager if SniperX is running but wallet manager isn't
+                        try:
+                            logger.info(f"Starting wallet manager from: {WALLET_MANAGER_PATH}")
+                            wallet_manager_process = await asyncio.create_subprocess_exec(
+                                sys.executable, WALLET_MANAGER_PATH,
+                                cwd=SCRIPT_DIR,
+                                stdout=asyncio.subprocess.PIPE,
+                                stderr=asyncio.subprocess.PIPE
+                            )
+                            logger.info(f"Wallet manager started with PID: {wallet_manager_process.pid}")
+
+                            # Give it a moment to start
+                            await asyncio.sleep(2)
+
+                            if wallet_manager_process.returncode is not None:
+                                error_output = (await wallet_manager_process.stderr.read()).decode() if wallet_manager_process.stderr else 'No error output'
+                                logger.error(f"Wallet manager failed to start. Exit code: {wallet_manager_process.returncode}, Error: {error_output}")
+                                balance_text = "Failed to start wallet manager. Please check logs and restart SniperX."
                             else:
-                                last_update = datetime.fromtimestamp(current_balance["timestamp"], pytz.UTC).strftime("%H:%M:%S")
-                                balance_text = f"Current Balance:\nSOL: {current_balance['sol']:.6f}\nUSD: ${current_balance['usd']:.2f}\n\nLast Update: {last_update}"
-                                logger.info("Balance retrieved successfully")
-                    except Exception as e:
-                        logger.exception("Error in wallet manager startup:")
-                        balance_text = f"Error starting wallet manager: {str(e)}. Please check logs and restart SniperX."
+                                logger.info("Wallet manager started successfully, reading balance...")
+                                current_balance = await read_wallet_balance()
+                                logger.info(f"Balance after wallet manager start: {current_balance}")
+
+                                if current_balance["sol"] == 0.0:
+                                    balance_text = "Wallet manager is starting up. Please wait a moment and try again."
+                                    logger.info(balance_text)
+                                else:
+                                    last_update = datetime.fromtimestamp(current_balance["timestamp"], pytz.UTC).strftime("%H:%M:%S")
+                                    balance_text = f"Current Balance:\nSOL: {current_balance['sol']:.6f}\nUSD: ${current_balance['usd']:.2f}\n\nLast Update: {last_update}"
+                                    logger.info("Balance retrieved successfully")
+                        except Exception as e:
+                            logger.exception("Error in wallet manager startup:")
+                            balance_text = f"Error starting wallet manager: {str(e)}. Please check logs and restart SniperX."
+                    else:
+                        logger.info("Wallet manager is running, reading balance...")
+                        current_balance = await read_wallet_balance()
+                        logger.info(f"Current balance: {current_balance}")
+
+                        if current_balance["sol"] == 0.0:
+                            balance_text = "Waiting for wallet balance update...\nPlease try again in a few seconds."
+                            logger.info(balance_text)
+                        else:
+                            last_update = datetime.fromtimestamp(current_balance["timestamp"], pytz.UTC).strftime("%H:%M:%S")
+                            balance_text = f"Current Balance:\nSOL: {current_balance['sol']:.6f}\nUSD: ${current_balance['usd']:.2f}\n\nLast Update: {last_update}"
+                            logger.info("Balance retrieved successfully")
+                except Exception as e:
+                    logger.exception("Unexpected error in show_balance:")
+                    balance_text = f"An unexpected error occurred: {str(e)}. Please check logs and try again."
                 else:
-                    logger.info("Wallet manager is running, reading balance...")
-                    current_balance = await read_wallet_balance()
-                    logger.info(f"Current balance: {current_balance}")
-                    
-                    if current_balance["sol"] == Decimal("0"):
+                    if current_balance["sol"] == 0.0:
                         balance_text = "Waiting for wallet balance update...\nPlease try again in a few seconds."
-                        logger.info(balance_text)
                     else:
                         last_update = datetime.fromtimestamp(current_balance["timestamp"], pytz.UTC).strftime("%H:%M:%S")
                         balance_text = f"Current Balance:\nSOL: {current_balance['sol']:.6f}\nUSD: ${current_balance['usd']:.2f}\n\nLast Update: {last_update}"
-                        logger.info("Balance retrieved successfully")
-            except Exception as e:
-                logger.exception("Unexpected error in show_balance:")
-                balance_text = f"An unexpected error occurred: {str(e)}. Please check logs and try again."
-            else:
-                if current_balance["sol"] == Decimal("0"):
-                    balance_text = "Waiting for wallet balance update...\nPlease try again in a few seconds."
-                else:
-                    last_update = datetime.fromtimestamp(current_balance["timestamp"], pytz.UTC).strftime("%H:%M:%S")
-                    balance_text = f"Current Balance:\nSOL: {current_balance['sol']:.6f}\nUSD: ${current_balance['usd']:.2f}\n\nLast Update: {last_update}"
             
             # Always try to edit the existing message first
             try:
                 await query.edit_message_text(
                     text=balance_text,
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔄 Refresh", callback_data='show_balance'),
-                        InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
-                    ]])
+                    reply_markup=BALANCE_MARKUP
                 )
             except Exception as e:
                 logger.error(f"Error updating balance message: {e}")
@@ -444,10 +559,7 @@ async def button_callback(update: Update, context: CallbackContext) -> None:
                         await query.message.delete()
                         await query.message.reply_text(
                             text=balance_text,
-                            reply_markup=InlineKeyboardMarkup([[
-                                InlineKeyboardButton("🔄 Refresh", callback_data='show_balance'),
-                                InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
-                            ]])
+                            reply_markup=BALANCE_MARKUP
                         )
                 except Exception as delete_error:
                     logger.error(f"Error handling message update: {delete_error}")
@@ -459,18 +571,11 @@ async def button_callback(update: Update, context: CallbackContext) -> None:
             try:
                 await query.message.reply_text(
                     "An error occurred. Please try /menu again.",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Back to Menu", callback_data='back_to_menu')
-                    ]])
+                    reply_markup=BACK_MARKUP
                 )
             except Exception as reply_error:
                 logger.error(f"Error sending error message: {reply_error}")
 
-async def unknown_command(update: Update, context: CallbackContext) -> None:
-    if not is_authorized(update): return
-    if update.message:
-        await update.message.reply_text("Sorry, I didn't understand that command.")
-
 def main_telegram_bot() -> None:
     """Start the bot."""
     if not TELEGRAM_TOKEN:
@@ -486,18 +591,18 @@ def main_telegram_bot() -> None:
     job_queue = JobQueue()
     application = Application.builder().token(TELEGRAM_TOKEN).job_queue(job_queue).build()
 
+    # Drop commands from other chats before they reach a handler
+    chat_filter = _build_chat_filter()
+
     # Command handlers
-    application.add_handler(CommandHandler("start", start_command)) # Start SniperX
-    application.add_handler(CommandHandler("stop", stop_command))   # Stop SniperX
-    application.add_handler(CommandHandler("status", status_command)) # Get SniperX status
-    application.add_handler(CommandHandler("menu", show_menu)) # Show control menu
+    application.add_handler(CommandHandler("start", start_command, filters=chat_filter)) # Start SniperX
+    application.add_handler(CommandHandler("stop", stop_command, filters=chat_filter))   # Stop SniperX
+    application.add_handler(CommandHandler("status", status_command, filters=chat_filter)) # Get SniperX status
+    application.add_handler(CommandHandler("menu", show_menu, filters=chat_filter)) # Show control menu
 
-    # CallbackQueryHandler for inline buttons
+    # CallbackQueryHandler for inline buttons (takes no filters; button_callback checks is_authorized)
     application.add_handler(CallbackQueryHandler(button_callback))
 
-    # Handler for unknown commands
-    application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
-
     logger.info("Telegram Manager Bot started. Send /menu to interact.")
     
     # Send a startup message to the designated chat ID if configured
@@ -507,36 +612,41 @@ def main_telegram_bot() -> None:
         except Exception as e:
             logger.error(f"Could not send startup message to TELEGRAM_CHAT_ID {TELEGRAM_CHAT_ID}: {e}")
 
+    use_webhook = TELEGRAM_TRANSPORT == "webhook"
+    if use_webhook and not PUBLIC_URL:
+        logger.warning("TELEGRAM_TRANSPORT=webhook but TELEGRAM_WEBHOOK_URL is not set. Falling back to polling.")
+        use_webhook = False
+
     try:
         # Start the bot
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        # Keep the loop open: the children are asyncio processes and are reaped on it below
+        if use_webhook:
+            logger.info(f"Receiving updates via webhook on port {PORT}.")
+            application.run_webhook(
+                listen="0.0.0.0",
+                port=PORT,
+                url_path=SECRET_PATH,
+                webhook_url=f"{PUBLIC_URL}/{SECRET_PATH}",
+                secret_token=SECRET_PATH,
+                allowed_updates=ALLOWED_UPDATES,
+                close_loop=False,
+            )
+        else:
+            application.run_polling(allowed_updates=ALLOWED_UPDATES, close_loop=False)
     except Exception as e:
-        logger.error(f"Error in polling: {e}")
+        logger.error(f"Error in {'webhook' if use_webhook else 'polling'}: {e}")
     finally:
         # Cleanup when bot stops
         global sniperx_process, wallet_manager_process
-        if sniperx_process and sniperx_process.poll() is None:
+        loop.run_until_complete(_cancel_chat_workers())
+        if sniperx_process and sniperx_process.returncode is None:
             logger.info("Telegram bot shutting down. Attempting to stop SniperX V2.py...")
-            if os.name == 'nt':
-                sniperx_process.terminate()
-            else:
-                os.kill(sniperx_process.pid, signal.SIGINT)
-            try:
-                sniperx_process.wait(5)
-            except subprocess.TimeoutExpired:
-                sniperx_process.kill()
+            loop.run_until_complete(_stop_process(sniperx_process, timeout=5))
             logger.info("SniperX V2.py process terminated during bot shutdown.")
         
-        if wallet_manager_process and wallet_manager_process.poll() is None:
+        if wallet_manager_process and wallet_manager_process.returncode is None:
             logger.info("Stopping wallet manager...")
-            if os.name == 'nt':
-                wallet_manager_process.terminate()
-            else:
-                os.kill(wallet_manager_process.pid, signal.SIGINT)
-            try:
-                wallet_manager_process.wait(5)
-            except subprocess.TimeoutExpired:
-                wallet_manager_process.kill()
+            loop.run_until_complete(_stop_process(wallet_manager_process, timeout=5))
             logger.info("Wallet manager terminated during bot shutdown.")
         
         loop.close()
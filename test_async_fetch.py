@@ -24,8 +24,12 @@ def test_process_window_async(monkeypatch, tmp_path):
             return [{'priceUsd': '0.1', 'liquidity': {'usd': 1000}, 'volume': {'m5': 10}}]
         else:
             return [{'priceUsd': '0.15', 'liquidity': {'usd': 1500}, 'volume': {'m5': 20}}]
+    real_sleep = asyncio.sleep
+    async def skip_window_sleep(delay, *args, **kwargs):
+        # Only the window wait (>= 60s) is skipped; the mocked fetch latency still applies.
+        return await real_sleep(0 if delay >= 60 else delay, *args, **kwargs)
     monkeypatch.setattr(sniper, 'fetch_token_data', mock_fetch)
-    monkeypatch.setattr(sniper.time, 'sleep', lambda s: None)
+    monkeypatch.setattr(sniper.asyncio, 'sleep', skip_window_sleep)
 
     tokens = []
     now = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)
@@ -42,3 +46,21 @@ def test_process_window_async(monkeypatch, tmp_path):
         reader = csv.reader(f)
         header = next(reader)
     assert header == ['Address','Name','Price USD','Liquidity(1m)','Volume(1m)','1m Change','Open Chart','Snipe','Ghost Buyer']
+
+
+def test_process_window_skips_addresses_already_in_csv(monkeypatch, tmp_path):
+    snaps = iter([
+        {'T0': [{'priceUsd': '0.1', 'liquidity': {'usd': 1000}, 'volume': {'m5': 10}}]},
+        {'T0': [{'priceUsd': '0.15', 'liquidity': {'usd': 1500}, 'volume': {'m5': 20}}]},
+    ] * 2)
+    async def fake_capture(addrs, sleep_seconds, win_minutes):
+        return next(snaps), next(snaps)
+    monkeypatch.setattr(sniper, 'capture_two_snapshots', fake_capture)
+
+    tokens = [{'tokenAddress': 'T0', 'name': 'Token0', 'symbol': 'T0'}]
+    sniper.process_window(1, tokens, str(tmp_path))
+    sniper.process_window(1, tokens, str(tmp_path))
+
+    with open(tmp_path / "sniperx_results_1m.csv", newline='') as f:
+        rows = list(csv.reader(f))
+    assert [r[0] for r in rows] == ['Address', 'T0']
@@ -2,11 +2,37 @@
 """
 Bubblemaps Extractor - Multi-Threaded (Multiple Windows)
 """
+import os
+import select
+import signal
+
+# Read end of the signal wake-up pipe. The CSV watchdog sends SIGUSR1 on new rows, and
+# signal.set_wakeup_fd writes a byte here, so an idle wait ends early. None if unsupported.
+CSV_WAKEUP_FD = None
+
+def install_csv_change_wakeup():
+    """Route SIGUSR1 to a self-pipe. Must run in the main thread."""
+    global CSV_WAKEUP_FD
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    signal.set_wakeup_fd(write_fd)
+    # The Python-level handler does nothing; the C handler has already written to the pipe.
+    # Installing it keeps SIGUSR1's default action (terminate) from applying.
+    signal.signal(signal.SIGUSR1, lambda signum, frame: None)
+    CSV_WAKEUP_FD = read_fd
+
+# The watchdog may signal as soon as it has launched us; take over SIGUSR1 (default action:
+# terminate) before the slow imports below rather than in the __main__ block.
+if __name__ == '__main__':
+    install_csv_change_wakeup()
+
 import sys
 import pytest
 pytest.importorskip("selenium")
 import csv
-import os
 import re
 import logging
 import time
@@ -53,6 +79,21 @@ MAX_BUBBLEMAPS_RETRIES = 3
 PROCESSED_TOKENS_LOCK = threading.Lock()
 CLUSTER_SUMMARY_LOCK = threading.Lock()
 
+def wait_for_csv_change(timeout):
+    """Sleep up to timeout seconds; return True if a signal arrived on the wake-up pipe."""
+    if CSV_WAKEUP_FD is None:
+        time.sleep(timeout)
+        return False
+    ready, _, _ = select.select([CSV_WAKEUP_FD], [], [], timeout)
+    if not ready:
+        return False
+    try:
+        while os.read(CSV_WAKEUP_FD, 512):
+            pass
+    except BlockingIOError:
+        pass
+    return True
+
 def setup_logging():
     logging.basicConfig(
         level=logging.INFO,
@@ -896,7 +937,8 @@ def monitor_and_process_tokens(csv_fpath: str, chrome_bin_path: str, chrome_drv_
                             active_futures[fut] = token_s
                     elif not active_futures and not processed_this_cycle and newly_processed_count == 0:
                         logging.info(f"No new tokens, no active tasks. Waiting {CHECK_INTERVAL}s...")
-                        time.sleep(CHECK_INTERVAL)
+                        if wait_for_csv_change(CHECK_INTERVAL):
+                            logging.info("Watchdog reported a CSV change. Rescanning.")
                     else:
                         time.sleep(5)
                 else: